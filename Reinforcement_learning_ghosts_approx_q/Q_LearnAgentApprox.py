@@ -10,6 +10,9 @@ from collections import Counter
 #import util
 
 class PacmanAgent(Agent):
+    # Weights are updated at every move, evaluation games included
+    learns = True
+
     def __init__(self, args):
         """
         Arguments:
@@ -41,9 +44,19 @@ class PacmanAgent(Agent):
         # last action
         self.last_action = []
 
+        # maze distances of the layouts played, by layout fingerprint
+        self.layout_distances = {}
+
+    # Maze distances are memory-mapped from the layouts: copies of the agent
+    # load them again rather than carrying them.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['layout_distances'] = {}
+        return state
+
     # Simulates flipping a coin with probability p of returning True.
     def coinFlip(self, p):
-        return (random.random() < p)
+        return (self.rng.random() < p)
     
     # Check if all values in the Counter are the same.
     def allValuesSame(self, counter):
@@ -53,7 +66,36 @@ class PacmanAgent(Agent):
         first_value = next(iter(counter.values()))
         return all(value == first_value for value in counter.values())
     
+    # Layouts with more free cells than this are searched at each query
+    # rather than having all their maze distances computed before playing.
+    MAX_DISTANCE_CELLS = 1000
+
+    # Maze distances of a layout (None to search at each query).
+    def getLayoutDistances(self, layout):
+        distances = layout.getDistances(build=False)
+        if distances is None and \
+                layout.walls.count(False) <= self.MAX_DISTANCE_CELLS:
+            distances = layout.getDistances()
+        return distances
+
+    # Maze distance to the nearest food, from the distances of the layout
+    # when it has them, with a breadth-first search otherwise.
     def nearestFoodDist(self, state, posit, food, walls):
+        layout = state.data.layout
+        fingerprint = layout.getFingerprint()
+        if fingerprint not in self.layout_distances:
+            self.layout_distances[fingerprint] = \
+                self.getLayoutDistances(layout)
+        distances = self.layout_distances[fingerprint]
+        if distances is None:
+            return self.searchNearestFoodDist(posit, food, walls)
+        dist = min((distances.distance(posit, f) for f in food.asList()),
+                   default=math.inf)
+        if dist == math.inf:
+            return None
+        return dist
+
+    def searchNearestFoodDist(self, posit, food, walls):
         grid = [(posit[0], posit[1], 0)]
         neighbors = set()
         while grid:
@@ -181,7 +223,7 @@ class PacmanAgent(Agent):
         
         # Check if all Q-values are the same
         if self.allValuesSame(state_actions):
-             best_action =  random.choice(legals)
+             best_action =  self.rng.choice(legals)
         else:
             # Get the action with the highest Q-value
             best_action = max(state_actions, key=state_actions.get)
@@ -197,7 +239,7 @@ class PacmanAgent(Agent):
         
         # Check if all Q-values are the same
         if self.allValuesSame(state_actions):
-             best_action =  random.choice(legals)
+             best_action =  self.rng.choice(legals)
         else:
             # Get the action with the highest Q-value
             best_action = max(state_actions, key=state_actions.get)
@@ -235,7 +277,7 @@ class PacmanAgent(Agent):
         # random action choice for exploring
         flip = self.coinFlip(self.epsilon)
         if flip:
-            action =  random.choice(legals)
+            action =  self.rng.choice(legals)
         else:
             action = self.getMaxFeaturesQ_Action(state)
 
@@ -13,6 +13,7 @@ class PacmanAgent(Agent):
         """
         self.args = args
         self.nb_ghosts = 0
+        self.depth_reached = False
 
     def __get_info(self, state):
         """Returns information about a state to uniquely identify it.
@@ -33,7 +34,8 @@ class PacmanAgent(Agent):
 
         return tuple([hash(pos), hash(food), tuple(ghost_pos)])
 
-    def __max_value(self, state, alpha, beta, visited, ghost_index):
+    def __max_value(self, state, alpha, beta, visited, ghost_index,
+                    depth=math.inf):
         """
         Arguments:
         ----------
@@ -43,6 +45,7 @@ class PacmanAgent(Agent):
         - `beta`: the value of the best (i.e., lowest-value) choice we have
         found so far at any choice point along the path for MIN.
         - `ghost_index`: the index of the ghost agent.
+        - `depth`: the number of Pacman moves left to search.
 
         Returns:
         ----------
@@ -52,29 +55,40 @@ class PacmanAgent(Agent):
         if state.isWin() or state.isLose():
             return state.getScore()
 
+        # Check the depth limit
+        if depth == 0:
+            self.depth_reached = True
+            return state.getScore()
+
         # Initialize value
         value = - math.inf
 
         # Add the current node to the visited set
         visited.add(self.__get_info(state))
 
-        successors = state.generatePacmanSuccessors()
-        for succ in successors:
+        # Play each move in place and take it back once explored
+        for action in state.expand(0):
+            token = state.apply(0, action)
             # Check if it was already visited
-            if self.__get_info(succ[0]) not in visited:
-                new_visited = visited.copy()
-                value = max(value, self.__min_value(succ[0], alpha, beta,
-                                                    new_visited, ghost_index))
-                if value >= beta:
-                    return value
-                alpha = max(alpha, value)
+            if self.__get_info(state) in visited:
+                state.undo(token)
+                continue
+            new_visited = visited.copy()
+            value = max(value, self.__min_value(state, alpha, beta,
+                                                new_visited, ghost_index,
+                                                depth - 1))
+            state.undo(token)
+            if value >= beta:
+                return value
+            alpha = max(alpha, value)
 
         if value == -math.inf:
             value = math.inf
 
         return value
 
-    def __min_value(self, state, alpha, beta, visited, ghost_index):
+    def __min_value(self, state, alpha, beta, visited, ghost_index,
+                    depth=math.inf):
         """
         Arguments:
         ----------
@@ -84,6 +98,7 @@ class PacmanAgent(Agent):
         - `beta`: the value of the best (i.e., lowest-value) choice we have
         found so far at any choice point along the path for MIN.
         - `ghost_index`: the index of the ghost agent.
+        - `depth`: the number of Pacman moves left to search.
 
         Returns:
         ----------
@@ -99,39 +114,41 @@ class PacmanAgent(Agent):
         # Add the current node to the visited set
         visited.add(self.__get_info(state))
 
-        successors = state.generateGhostSuccessors(ghost_index)
-        for succ in successors:
-            if self.__get_info(succ[0]) not in visited:
-                new_visited = visited.copy()
-                if ghost_index > 1:
-                    value = min(value, self.__min_value(succ[0], alpha, beta,
-                                                        new_visited,
-                                                        ghost_index-1))
-                else:
-                    value = min(value, self.__max_value(succ[0], alpha, beta,
-                                                        new_visited,
-                                                        self.nb_ghosts))
-                if value <= alpha:
-                    return value
-                beta = min(beta, value)
+        for action in state.expand(ghost_index):
+            token = state.apply(ghost_index, action)
+            if self.__get_info(state) in visited:
+                state.undo(token)
+                continue
+            new_visited = visited.copy()
+            if ghost_index > 1:
+                value = min(value, self.__min_value(state, alpha, beta,
+                                                    new_visited,
+                                                    ghost_index-1, depth))
+            else:
+                value = min(value, self.__max_value(state, alpha, beta,
+                                                    new_visited,
+                                                    self.nb_ghosts, depth))
+            state.undo(token)
+            if value <= alpha:
+                return value
+            beta = min(beta, value)
 
         if value == math.inf:
             value = -math.inf
 
         return value
 
-    def get_action(self, state):
+    def __search(self, state, depth):
         """
-        Given a pacman game state, returns a legal move according to the
-        Alphabeta algorithm.
         Arguments:
         ----------
         - `state`: the current game state.
+        - `depth`: the number of Pacman moves to search.
 
-        Return:
-        -------
-        - The best legal move as defined in `game.Directions`, according to
-        the Alphabeta algorithm.
+        Returns:
+        ----------
+        The best legal move found by the Alphabeta algorithm, searching
+        `depth` Pacman moves ahead.
         """
         visited = set()
         alpha = - math.inf
@@ -146,13 +163,50 @@ class PacmanAgent(Agent):
         visited.add(self.__get_info(state))
 
         # For each successor of the current node
-        pac_successors = state.generatePacmanSuccessors()
-        for next_state, next_action in pac_successors:
-            value = self.__min_value(next_state, alpha, beta, visited,
-                                     self.nb_ghosts)
+        for next_action in state.expand(0):
+            token = state.apply(0, next_action)
+            value = self.__min_value(state, alpha, beta, visited,
+                                     self.nb_ghosts, depth - 1)
+            state.undo(token)
             if value > best_value:
                 best_value = value
                 best_action = next_action
             alpha = max(alpha, best_value)
 
         return best_action
+
+    def get_action(self, state):
+        """
+        Given a pacman game state, returns a legal move according to the
+        Alphabeta algorithm.
+        Arguments:
+        ----------
+        - `state`: the current game state.
+
+        Return:
+        -------
+        - The best legal move as defined in `game.Directions`, according to
+        the Alphabeta algorithm.
+        """
+        return self.__search(state, math.inf)
+
+    def get_anytime_actions(self, state):
+        """
+        Given a pacman game state, yields the best legal moves found by
+        Alphabeta searches of increasing depth, until the deadline of the
+        move cuts the search off or a search is no longer limited by its
+        depth (its move is then the one get_action returns).
+        Arguments:
+        ----------
+        - `state`: the current game state.
+
+        Return:
+        -------
+        - Legal moves as defined in `game.Directions`.
+        """
+        depth = 1
+        self.depth_reached = True
+        while self.depth_reached:
+            self.depth_reached = False
+            yield self.__search(state, depth)
+            depth += 1
@@ -0,0 +1,607 @@
+import contextlib
+import gc
+import heapq
+import io
+import random
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import numpy as np
+
+from pacman_module import layout, mazes, textDisplay
+from pacman_module.game import Agent
+from pacman_module.ghostAgents import DumbyGhost, GreedyGhost
+from pacman_module.pacman import Directions, GameState, iterGames, runGames
+from pacman_module.vecenv import VecEnv
+
+ghosts = {}
+ghosts["greedy"] = GreedyGhost
+ghosts["dumby"] = DumbyGhost
+
+
+class RandomAgent(Agent):
+    """
+    A Pacman agent playing uniformly random moves, to time the engine
+    rather than the agent.
+    """
+
+    def get_action(self, state):
+        legals = state.getLegalActions()
+        legals.remove(Directions.STOP)
+        return self.rng.choice(legals)
+
+
+class TimedAgent(Agent):
+    """
+    Wraps an anytime agent and records how long each of its moves took,
+    cut-offs at the deadline included.
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.move_times = []
+
+    def get_anytime_actions(self, state):
+        self.agent.rng = self.rng
+        t = time.monotonic()
+        try:
+            yield from self.agent.get_anytime_actions(state)
+        finally:
+            self.move_times.append(time.monotonic() - t)
+
+
+def expand_states(lay, max_states, track=None):
+    """
+    Runs a breadth-first search over Pacman moves, keeping every generated
+    state in a dictionary the way the search agents keep their `meta` dict.
+
+    Arguments:
+    ----------
+    - `lay`: layout to search.
+    - `max_states`: number of states after which the search stops.
+    - `track`: explored-state tracking mode of the search (see
+               ExpansionContext).
+
+    Return:
+    -------
+    - The list of stored states and the search time in seconds.
+    """
+    start = GameState()
+    start.initialize(lay, 0)
+    start.setExploredTracking(track)
+
+    t = time.time()
+    meta = {start: None}
+    fringe = [start]
+    while fringe and len(meta) < max_states:
+        state = fringe.pop(0)
+        if state.isWin():
+            continue
+        for succ, action in state.generatePacmanSuccessors():
+            if succ not in meta:
+                meta[succ] = (state, action)
+                fringe.append(succ)
+    return list(meta), time.time() - t
+
+
+class LegacyConfiguration:
+    """
+    Stand-in for the Configuration of the engine before incremental
+    hashing, with its per-call __hash__.
+    """
+
+    def __init__(self, configuration):
+        self.pos = configuration.pos
+        self.direction = configuration.direction
+
+    def __hash__(self):
+        x = hash(self.pos)
+        y = hash(self.direction)
+        return hash(x + 13 * y)
+
+
+class LegacyAgentState:
+    """
+    Stand-in for the AgentState of the engine before incremental hashing.
+    """
+
+    def __init__(self, agentState):
+        self.configuration = LegacyConfiguration(agentState.configuration)
+        self.scaredTimer = agentState.scaredTimer
+
+    def __hash__(self):
+        return hash(hash(self.configuration) + 13 * hash(self.scaredTimer))
+
+
+class LegacyGrid:
+    """
+    Stand-in for the list-of-lists Grid of the engine before incremental
+    hashing, with its cell-by-cell __hash__.
+    """
+
+    def __init__(self, grid):
+        self.data = [list(column) for column in
+                     (grid[x] for x in range(grid.width))]
+
+    def __hash__(self):
+        base = 1
+        h = 0
+        for l in self.data:
+            for i in l:
+                if i:
+                    h += base
+                base *= 2
+        return hash(h)
+
+
+class LegacyStateData:
+    """
+    Stand-in for the GameStateData of the engine before incremental
+    hashing: its __hash__ is the baseline one, rebuilt from every agent
+    state, the food grid, the capsules and the score at each call.
+    """
+
+    def __init__(self, data):
+        self.agentStates = [LegacyAgentState(agentState)
+                            for agentState in data.agentStates]
+        self.food = LegacyGrid(data.food)
+        self.capsules = list(data.capsules)
+        self.score = data.score
+
+    def __hash__(self):
+        for i, state in enumerate(self.agentStates):
+            try:
+                int(hash(state))
+            except TypeError as e:
+                print(e)
+        return int((hash(tuple(self.agentStates)) + 13 * hash(self.food) +
+                    113 * hash(tuple(self.capsules)) + 7 * hash(self.score))
+                   % 1048575)
+
+
+def bench_hashing(args):
+    """
+    Compares the incremental Zobrist hash of a state with the hash of the
+    engine before it (see LegacyStateData), on the states of a
+    hashing-heavy search. The Zobrist key rebuilt from scratch is timed
+    too.
+    """
+    for layout_name in args.layouts:
+        states, search_time = expand_states(
+            layout.getLayout(layout_name), args.states)
+        legacy_states = [LegacyStateData(state.data) for state in states]
+
+        t = time.time()
+        for _ in range(args.repeat):
+            for state in states:
+                hash(state)
+        incremental = (time.time() - t) / (args.repeat * len(states))
+
+        t = time.time()
+        for _ in range(args.repeat):
+            for state in legacy_states:
+                hash(state)
+        legacy = (time.time() - t) / (args.repeat * len(states))
+
+        t = time.time()
+        for _ in range(args.repeat):
+            for state in states:
+                state.data.computeHash()
+        scratch = (time.time() - t) / (args.repeat * len(states))
+
+        print("%-8s states: %7d  search: %6.2fs  hash: %6.2fus  "
+              "baseline hash: %6.2fus  speedup: %5.1fx  "
+              "Zobrist from scratch: %6.2fus" %
+              (layout_name, len(states), search_time, incremental * 1e6,
+               legacy * 1e6, legacy / incremental, scratch * 1e6))
+
+
+def bench_memory(args):
+    """
+    Measures the memory kept alive per state when a search stores every
+    state it generates, with each explored-state tracking mode.
+    """
+    for layout_name in args.layouts:
+        for track in args.track:
+            gc.collect()
+            tracemalloc.start()
+            states, search_time = expand_states(
+                layout.getLayout(layout_name), args.states,
+                None if track == 'none' else track)
+            gc.collect()
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print("%-8s track: %-5s  states: %7d  search: %6.2fs  "
+                  "memory: %8.1f KiB  per state: %6.0f bytes" %
+                  (layout_name, track, len(states), search_time,
+                   size / 1024., size / len(states)))
+            del states
+
+
+def bench_vecenv(args):
+    """
+    Compares environment steps (rounds of Pacman and ghost moves) per second
+    of the single-game loop and of VecEnv.
+    """
+    lay = layout.getLayout(args.layout)
+    gagts = [ghosts[args.ghostagent](i + 1)
+             for i in range(lay.getNumGhosts())]
+
+    random.seed(args.seed)
+    t = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        games = runGames(lay, RandomAgent(), gagts, textDisplay.NullGraphics(),
+                         numGames=args.games, record=False)
+    elapsed = time.time() - t
+    steps = sum(len([move for move in game.moveHistory if move[0] == 0])
+                for game in games)
+    single = steps / elapsed
+    print("single-game loop : %9.0f steps/s  (%d games)" %
+          (single, args.games))
+
+    rng = np.random.RandomState(args.seed)
+    env = VecEnv(lay, args.envs, ghosts[args.ghostagent])
+    _, legal = env.reset()
+    t = time.time()
+    for _ in range(args.steps):
+        # Random legal moves, never STOP
+        draws = rng.random_sample(legal.shape) * legal
+        actions = draws[:, :4].argmax(axis=1)
+        _, _, _, legal = env.step(actions)
+    elapsed = time.time() - t
+    batched = args.envs * args.steps / elapsed
+    print("VecEnv (%4d envs): %9.0f steps/s  speedup: %5.1fx" %
+          (args.envs, batched, batched / single))
+
+
+def bench_turbo(args):
+    """
+    Compares plies per second of the normal and turbo game loops, playing
+    the same seeded games with both.
+    """
+    lay = layout.getLayout(args.layout)
+    gagts = [ghosts[args.ghostagent](i + 1)
+             for i in range(lay.getNumGhosts())]
+
+    results = {}
+    for turbo in (False, True):
+        random.seed(args.seed)
+        t = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            games = runGames(lay, RandomAgent(), gagts,
+                             textDisplay.NullGraphics(), numGames=args.games,
+                             record=False, turbo=turbo)
+        elapsed = time.time() - t
+        plies = sum(len(game.moveHistory) for game in games)
+        results[turbo] = [game.state.getScore() for game in games]
+        print("%-6s loop: %9.0f plies/s  (%d games, %d plies)" %
+              ("turbo" if turbo else "normal", plies / elapsed,
+               args.games, plies))
+    print("Same scores: %s" % (results[False] == results[True]))
+
+
+def bench_deadline(args):
+    """
+    Plays games with anytime search agents under a wall-clock move time and
+    reports how far past their deadline moves are made.
+    """
+    import importlib
+    lay = layout.getLayout(args.layout)
+    gagts = [ghosts[args.ghostagent](i + 1)
+             for i in range(lay.getNumGhosts())]
+
+    for name in args.agents:
+        agent = TimedAgent(importlib.import_module(name).PacmanAgent(args))
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = list(iterGames(lay, agent, gagts,
+                                     textDisplay.NullGraphics(),
+                                     numGames=args.games, timeout=0,
+                                     seed=args.seed, turbo=True,
+                                     moveTime=args.movetime))
+        late = sorted(t - args.movetime for t in agent.move_times)
+        print("%-9s moves: %5d  mean score: %7.1f  overshoot (ms): "
+              "median %6.2f  p99 %6.2f  max %6.2f" %
+              (name, len(late), sum(r.score for r in results) / len(results),
+               1e3 * late[len(late) // 2],
+               1e3 * late[min(len(late) - 1, int(len(late) * .99))],
+               1e3 * late[-1]))
+
+
+def bench_layouts(args):
+    """
+    Compares the set-up cost of a layout parsed from its text, rebuilt
+    from its compiled form on disk and handed out by the registry.
+    """
+    for layout_name in args.layouts:
+        text = layout.getLayout(layout_name).layoutText
+
+        t = time.time()
+        for _ in range(args.repeat):
+            layout.Layout(text).getMoveTable()
+        parsed = (time.time() - t) / args.repeat
+
+        t = time.time()
+        for _ in range(args.repeat):
+            layout.loadCompiled(text).getMoveTable()
+        compiled = (time.time() - t) / args.repeat
+
+        t = time.time()
+        for _ in range(args.repeat):
+            layout.getLayout(layout_name).getMoveTable()
+        registry = (time.time() - t) / args.repeat
+
+        print("%-10s parsed: %8.1fus  compiled: %8.1fus  registry: %6.1fus" %
+              (layout_name, parsed * 1e6, compiled * 1e6, registry * 1e6))
+
+
+def bench_mazes(args):
+    """
+    Measures how the set-up of a layout, a search and games scale with the
+    size of generated mazes.
+    """
+    for size in args.sizes:
+        t = time.time()
+        lay = mazes.generateLayout(size, size, seed=args.seed,
+                                   loops=args.loops, ghosts=args.ghosts)
+        generate = time.time() - t
+
+        t = time.time()
+        lay.getMoveTable()
+        compile_time = time.time() - t
+
+        states, search_time = expand_states(lay, args.states)
+
+        gagts = [ghosts[args.ghostagent](i + 1) for i in range(args.ghosts)]
+        t = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = list(iterGames(lay, RandomAgent(), gagts,
+                                     textDisplay.NullGraphics(),
+                                     numGames=args.games, timeout=0,
+                                     seed=args.seed, turbo=True,
+                                     maxMoves=args.maxmoves))
+        plies = sum(r.moves for r in results)
+        print("%4dx%-4d cells: %6d  generate: %7.1fms  move table: %7.1fms  "
+              "search: %7.0f states/s  games: %7.0f plies/s" %
+              (size, size, len(lay.getMoveTable().actions), generate * 1e3,
+               compile_time * 1e3, len(states) / search_time,
+               plies / (time.time() - t)))
+
+
+def eat_all_food(lay, max_states, macro):
+    """
+    Runs a uniform cost search for the shortest way of eating all the food
+    of `lay`, over Pacman moves or over macro-actions (see
+    GameState.generatePacmanMacroSuccessors).
+
+    Return:
+    -------
+    - The number of expanded states, the number of moves of the solution
+      (None if none was found within `max_states` expansions) and the
+      search time in seconds.
+    """
+    start = GameState()
+    start.initialize(lay, 0)
+
+    t = time.time()
+    fringe = [(0, 0, start)]
+    closed = set()
+    tie = 0
+    while fringe and len(closed) < max_states:
+        cost, _, state = heapq.heappop(fringe)
+        if state.isWin():
+            return len(closed), cost, time.time() - t
+        if state in closed:
+            continue
+        closed.add(state)
+        if macro:
+            successors = state.generatePacmanMacroSuccessors()
+        else:
+            successors = [(succ, [action]) for succ, action in
+                          state.generatePacmanSuccessors()]
+        for succ, actions in successors:
+            if succ not in closed:
+                tie += 1
+                heapq.heappush(fringe, (cost + len(actions), tie, succ))
+    return len(closed), None, time.time() - t
+
+
+def bench_junctions(args):
+    """
+    Compares searches over the cells of layouts and over their junction
+    graphs, where corridors are followed in one macro-action.
+    """
+    for layout_name in args.layouts:
+        lay = layout.getLayout(layout_name)
+        t = time.time()
+        junctions = layout.Layout(lay.layoutText).getJunctions()
+        build = time.time() - t
+        cells = len(junctions.moves)
+        print("%-18s cells: %5d  nodes: %5d  edges: %5d  "
+              "branching: %4.2f -> %4.2f  build: %6.1fms" %
+              (layout_name, cells, len(junctions.nodes),
+               junctions.getNumEdges(),
+               sum(len(moves) for moves in junctions.moves.values()) / cells,
+               junctions.getNumEdges() / len(junctions.nodes),
+               build * 1e3))
+        for macro in [False, True]:
+            expanded, moves, search_time = eat_all_food(lay, args.states,
+                                                        macro)
+            print("    %-6s expanded: %8d  solution: %5s moves  "
+                  "search: %7.2fs" %
+                  ('macro' if macro else 'cells', expanded,
+                   '-' if moves is None else moves, search_time))
+
+
+if __name__ == '__main__':
+    usage = """
+    USAGE:      python benchmark.py <benchmark> <options>
+    EXAMPLES:   (1) python benchmark.py hashing --layouts medium large
+                    - times state hashing during a search, against
+                      the hash of the engine before Zobrist keys
+                (2) python benchmark.py memory --layouts medium large
+                    - measures the memory used per stored state
+                (3) python benchmark.py vecenv --envs 256
+                    - compares the single-game loop with VecEnv
+                (4) python benchmark.py turbo --games 200
+                    - compares the normal and turbo game loops
+                (5) python benchmark.py deadline --movetime 0.05
+                    - measures how late anytime agents move
+                (6) python benchmark.py layouts
+                    - compares the set-up cost of layouts
+                (7) python benchmark.py mazes --sizes 25 50 100 200
+                    - measures how the engine scales on generated mazes
+                (8) python benchmark.py junctions --layouts medium large
+                    - compares searches over cells and over junctions
+    """
+
+    parser = ArgumentParser(usage)
+    subparsers = parser.add_subparsers(dest='benchmark')
+    subparsers.required = True
+
+    hashing = subparsers.add_parser(
+        'hashing',
+        help='Time state hashing in a search that stores every state.')
+    hashing.add_argument(
+        '--layouts', nargs='+', default=['small', 'medium', 'large'],
+        help='Maze layouts (from layout folder).')
+    hashing.add_argument(
+        '--states', type=int, default=20000,
+        help='Number of states to expand per layout.')
+    hashing.add_argument(
+        '--repeat', type=int, default=5,
+        help='Number of times every state is hashed.')
+    hashing.set_defaults(run=bench_hashing)
+
+    memory = subparsers.add_parser(
+        'memory',
+        help='Measure the memory used per state stored by a search.')
+    memory.add_argument(
+        '--layouts', nargs='+', default=['medium', 'large'],
+        help='Maze layouts (from layout folder).')
+    memory.add_argument(
+        '--states', type=int, default=20000,
+        help='Number of states to expand per layout.')
+    memory.add_argument(
+        '--track', nargs='+', default=['none', 'count', 'ring', 'all'],
+        choices=['none', 'count', 'ring', 'cells', 'all'],
+        help='Explored-state tracking modes to compare.')
+    memory.set_defaults(run=bench_memory)
+
+    vecenv = subparsers.add_parser(
+        'vecenv',
+        help='Compare steps per second of the game loop and of VecEnv.')
+    vecenv.add_argument(
+        '--layout', default='medium_adv',
+        help='Maze layout (from layout folder).')
+    vecenv.add_argument(
+        '--ghostagent', choices=["dumby", "greedy"], default="greedy",
+        help='Ghost agent available in the `ghostAgents` module.')
+    vecenv.add_argument(
+        '--games', type=int, default=50,
+        help='Number of games played by the single-game loop.')
+    vecenv.add_argument(
+        '--envs', type=int, default=256,
+        help='Number of games played in lockstep by VecEnv.')
+    vecenv.add_argument(
+        '--steps', type=int, default=200,
+        help='Number of VecEnv steps.')
+    vecenv.add_argument(
+        '--seed', type=int, default=1,
+        help='Seed for random number generator')
+    vecenv.set_defaults(run=bench_vecenv)
+
+    turbo = subparsers.add_parser(
+        'turbo',
+        help='Compare plies per second of the normal and turbo game loops.')
+    turbo.add_argument(
+        '--layout', default='medium_adv',
+        help='Maze layout (from layout folder).')
+    turbo.add_argument(
+        '--ghostagent', choices=["dumby", "greedy"], default="greedy",
+        help='Ghost agent available in the `ghostAgents` module.')
+    turbo.add_argument(
+        '--games', type=int, default=200,
+        help='Number of games played by each loop.')
+    turbo.add_argument(
+        '--seed', type=int, default=1,
+        help='Seed for random number generator')
+    turbo.set_defaults(run=bench_turbo)
+
+    deadline = subparsers.add_parser(
+        'deadline',
+        help='Measure how late anytime agents make their moves.')
+    deadline.add_argument(
+        '--agents', nargs='+', default=['alphabeta', 'hminimax'],
+        help='Modules defining an anytime `PacmanAgent`.')
+    deadline.add_argument(
+        '--layout', default='medium_adv',
+        help='Maze layout (from layout folder).')
+    deadline.add_argument(
+        '--ghostagent', choices=["dumby", "greedy"], default="greedy",
+        help='Ghost agent available in the `ghostAgents` module.')
+    deadline.add_argument(
+        '--movetime', type=float, default=0.05,
+        help='Wall-clock time of a move, in seconds.')
+    deadline.add_argument(
+        '--games', type=int, default=3,
+        help='Number of games played by each agent.')
+    deadline.add_argument(
+        '--seed', type=int, default=1,
+        help='Seed for random number generator')
+    deadline.set_defaults(run=bench_deadline)
+
+    layouts = subparsers.add_parser(
+        'layouts',
+        help='Compare the set-up cost of parsed, compiled and shared layouts.')
+    layouts.add_argument(
+        '--layouts', nargs='+', default=['small', 'medium', 'large'],
+        help='Maze layouts (from layout folder).')
+    layouts.add_argument(
+        '--repeat', type=int, default=200,
+        help='Number of times each layout is set up.')
+    layouts.set_defaults(run=bench_layouts)
+
+    maze = subparsers.add_parser(
+        'mazes',
+        help='Measure how the engine scales on generated mazes.')
+    maze.add_argument(
+        '--sizes', nargs='+', type=int, default=[25, 50, 100, 200],
+        help='Widths (and heights) of the generated mazes.')
+    maze.add_argument(
+        '--loops', type=float, default=0.1,
+        help='Fraction of inner walls knocked down to make loops.')
+    maze.add_argument(
+        '--ghosts', type=int, default=2,
+        help='Number of ghosts.')
+    maze.add_argument(
+        '--ghostagent', choices=["dumby", "greedy"], default="greedy",
+        help='Ghost agent available in the `ghostAgents` module.')
+    maze.add_argument(
+        '--states', type=int, default=20000,
+        help='Number of states expanded by the search.')
+    maze.add_argument(
+        '--games', type=int, default=5,
+        help='Number of games played.')
+    maze.add_argument(
+        '--maxmoves', type=int, default=2000,
+        help='Number of moves after which games are truncated.')
+    maze.add_argument(
+        '--seed', type=int, default=1,
+        help='Seed for random number generator')
+    maze.set_defaults(run=bench_mazes)
+
+    junction = subparsers.add_parser(
+        'junctions',
+        help='Compare searches over cells and over junction graphs.')
+    junction.add_argument(
+        '--layouts', nargs='+', default=['small', 'medium', 'large'],
+        help='Maze layouts (from layout folder).')
+    junction.add_argument(
+        '--states', type=int, default=200000,
+        help='Number of states a search expands at most.')
+    junction.set_defaults(run=bench_junctions)
+
+    args = parser.parse_args()
+    args.run(args)
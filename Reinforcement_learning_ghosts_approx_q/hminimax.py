@@ -15,6 +15,7 @@ class PacmanAgent(Agent):
         self.args = args
         self.nb_ghosts = 0
         self.depth = 4
+        self.depth_reached = False
 
     def __cutoff_test(self, state, depth):
         """
@@ -28,7 +29,12 @@ class PacmanAgent(Agent):
         Returns true if the state is terminal or the maximal depth
         is reached.
         """
-        return state.isWin() or state.isLose() or depth == 0
+        if state.isWin() or state.isLose():
+            return True
+        if depth == 0:
+            self.depth_reached = True
+            return True
+        return False
 
     def __eval_state(self, state):
         """Returns a custum utility value of the state.
@@ -91,10 +97,12 @@ class PacmanAgent(Agent):
         # Initialize value
         value = - math.inf
 
-        successors = state.generatePacmanSuccessors()
-        for succ in successors:
-            value = max(value, self.__min_value(succ[0], alpha, beta,
+        # Play each move in place and take it back once explored
+        for action in state.expand(0):
+            token = state.apply(0, action)
+            value = max(value, self.__min_value(state, alpha, beta,
                                                 depth-1, ghost_index))
+            state.undo(token)
             if value >= beta:
                 return value
             alpha = max(alpha, value)
@@ -124,30 +132,31 @@ class PacmanAgent(Agent):
         # Initialize value
         value = math.inf
 
-        successors = state.generateGhostSuccessors(ghost_index)
-        for succ in successors:
+        for action in state.expand(ghost_index):
+            token = state.apply(ghost_index, action)
             if ghost_index > 1:
-                value = min(value, self.__min_value(succ[0], alpha, beta,
+                value = min(value, self.__min_value(state, alpha, beta,
                                                     depth, ghost_index-1))
             else:
-                value = min(value, self.__max_value(succ[0], alpha, beta,
+                value = min(value, self.__max_value(state, alpha, beta,
                                                     depth-1, self.nb_ghosts))
+            state.undo(token)
             if value <= alpha:
                 return value
             beta = min(beta, value)
 
         return value
 
-    def get_action(self, state):
+    def __search(self, state, depth):
         """
-        Given a pacman game state, returns a legal move.
         Arguments:
         ----------
         - `state`: the current game state.
+        - `depth`: the biggest autorized depth before evaluation.
 
-        Return:
-        -------
-        - A legal move as defined in `game.Directions`.
+        Returns:
+        ----------
+        The best legal move found by a search of the given depth.
         """
         alpha = - math.inf
         beta = math.inf
@@ -157,13 +166,47 @@ class PacmanAgent(Agent):
         # Get the number of ghosts in the layout
         self.nb_ghosts = state.getNumAgents() - 1
 
-        successors = state.generatePacmanSuccessors()
-        for next_state, next_action in successors:
-            value = self.__min_value(next_state, alpha, beta, self.depth,
+        for next_action in state.expand(0):
+            token = state.apply(0, next_action)
+            value = self.__min_value(state, alpha, beta, depth,
                                      self.nb_ghosts)
+            state.undo(token)
             if value > best_value:
                 best_value = value
                 best_action = next_action
             alpha = max(alpha, best_value)
 
         return best_action
+
+    def get_action(self, state):
+        """
+        Given a pacman game state, returns a legal move.
+        Arguments:
+        ----------
+        - `state`: the current game state.
+
+        Return:
+        -------
+        - A legal move as defined in `game.Directions`.
+        """
+        return self.__search(state, self.depth)
+
+    def get_anytime_actions(self, state):
+        """
+        Given a pacman game state, yields the best legal moves found by
+        searches of increasing depth, until the deadline of the move cuts
+        the search off or the whole game tree has been searched.
+        Arguments:
+        ----------
+        - `state`: the current game state.
+
+        Return:
+        -------
+        - Legal moves as defined in `game.Directions`.
+        """
+        depth = 1
+        self.depth_reached = True
+        while self.depth_reached:
+            self.depth_reached = False
+            yield self.__search(state, depth)
+            depth += 1
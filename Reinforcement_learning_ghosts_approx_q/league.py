@@ -0,0 +1,262 @@
+import contextlib
+import csv
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import statistics
+from argparse import ArgumentParser
+
+from pacman_module import layout, textDisplay
+from pacman_module.pacman import iterGames
+
+from run import ghosts, load_agent_from_file, positive_integer
+
+ENGINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'pacman_module')
+
+# Options changing the games played, part of the key of every cell
+CELL_OPTIONS = ['nghosts', 'numtraining', 'timeout', 'maxmoves',
+                'stallwindow']
+
+
+def engine_version():
+    """
+    Returns a content hash of the game engine (the `pacman_module` sources,
+    ghost agents included), so that cached results are dropped whenever
+    the engine changes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(glob.glob(os.path.join(ENGINE_DIR, '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode() + b'\0')
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def cell_key(agent_source, engine, ghost, layout_text, seed, options):
+    """
+    Returns the cache key of a cell: a content hash of the agent source,
+    the engine version, the ghost type, the layout, the seed and the
+    options of the games.
+    """
+    digest = hashlib.blake2b(agent_source, digest_size=16)
+    digest.update(json.dumps([engine, ghost, layout_text, seed, options],
+                             sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def load_cache(path):
+    """
+    Returns the cell results appended to the cache file `path` by previous
+    leagues, by cell key.
+    """
+    cache = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                # A league killed while writing leaves a partial last line
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                cache[entry['key']] = entry['result']
+    return cache
+
+
+# Agent classes loaded by a worker, by agent file
+_agent_classes = {}
+
+
+def play_cell(cell):
+    """
+    Plays the games of a cell of the league in a worker and returns the
+    key of the cell with the result of its evaluation game, or the error
+    the agent crashed with.
+    """
+    key, agentfile, ghost, layout_name, seed, args = cell
+    # Whatever the agent does, from its import on, only fails its cell;
+    # KeyboardInterrupt still stops the league
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if agentfile not in _agent_classes:
+                _agent_classes[agentfile] = load_agent_from_file(agentfile)
+            agent = _agent_classes[agentfile](args)
+            gagts = [ghosts[ghost](i + 1) for i in range(args.nghosts)]
+            result, = iterGames(layout.getLayout(layout_name), agent, gagts,
+                                textDisplay.NullGraphics(),
+                                numGames=args.numtraining + 1,
+                                numTraining=args.numtraining,
+                                timeout=args.timeout, seed=seed,
+                                maxMoves=args.maxmoves,
+                                stallWindow=args.stallwindow)
+    except KeyboardInterrupt:
+        raise
+    except BaseException as e:
+        return key, {'error': '%s: %s' % (type(e).__name__, e)}
+    return key, {'score': result.score, 'win': result.win,
+                 'truncated': result.truncated, 'moves': result.moves,
+                 'time': result.computeTimes[0],
+                 'expanded': result.expandedNodes}
+
+
+def write_table(path, rows):
+    """
+    Writes the results of the league to the CSV file `path`, one row per
+    agent, ghost and layout, averaged over the seeds the agent did not
+    crash with.
+    """
+    with open(path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Agent', 'Ghost', 'Layout', 'Games', 'Errors',
+                         'Mean Score', 'Win Rate', 'Truncated', 'Mean Moves',
+                         'Mean Computation Time', 'Mean Expanded Nodes'])
+        writer.writerows(rows)
+
+
+def main():
+    usage = """
+    USAGE:      python league.py <league_options>
+    EXAMPLES:   (1) python league.py --agents bfs.py astar.py --seeds 3
+                    - plays bfs and astar against every ghost on every
+                      layout, with 3 seeds
+                (2) python league.py --workers 4
+                    - plays the whole league over 4 processes
+    """
+
+    parser = ArgumentParser(usage)
+    parser.add_argument(
+        '--agents', nargs='+',
+        default=['dfs.py', 'bfs.py', 'ucs.py', 'astar.py', 'minimax.py',
+                 'alphabeta.py', 'hminimax.py', 'Q_LearnAgentApprox.py'],
+        help='Python files containing a `PacmanAgent` class.')
+    parser.add_argument(
+        '--ghosts', nargs='+', choices=sorted(ghosts),
+        default=sorted(ghosts),
+        help='Ghost agents available in the `ghostAgents` module.')
+    parser.add_argument(
+        '--layouts', nargs='+',
+        default=sorted(os.path.splitext(name)[0] for name in
+                       os.listdir(os.path.join(ENGINE_DIR, 'layouts'))
+                       if name.endswith('.lay')),
+        help='Maze layouts (from layout folder).')
+    parser.add_argument(
+        '--seeds',
+        help='Number of seeds (games) per agent, ghost and layout.',
+        type=positive_integer, default=1)
+    parser.add_argument(
+        '--nghosts',
+        help='Maximum number of ghosts in a maze.',
+        type=positive_integer, default=1)
+    parser.add_argument(
+        '--numtraining',
+        help='Number of training games played before each evaluation '
+             'game.',
+        type=positive_integer, default=0)
+    parser.add_argument(
+        '--timeout',
+        help='Node expansion budget of a move (0 for none).',
+        type=positive_integer, default=0)
+    parser.add_argument(
+        '--maxmoves',
+        help='Number of moves (of all agents) after which a game is '
+             'truncated.',
+        type=positive_integer, default=2000)
+    parser.add_argument(
+        '--stallwindow',
+        help='Number of Pacman moves over which a game going round in '
+             'circles is truncated.',
+        type=positive_integer, default=100)
+    parser.add_argument(
+        '--workers',
+        help='Number of processes playing the games.',
+        type=positive_integer, default=multiprocessing.cpu_count())
+    parser.add_argument(
+        '--cache',
+        help='File the result of every cell is appended to, and read back '
+             'from by later leagues.',
+        default='league_cache.jsonl')
+    parser.add_argument(
+        '--output',
+        help='CSV file the result table is written to.',
+        default='league_results.csv')
+
+    args = parser.parse_args()
+
+    engine = engine_version()
+    options = dict((name, getattr(args, name)) for name in CELL_OPTIONS)
+    cache = load_cache(args.cache)
+
+    # Every cell of the league, with its key
+    cells = []
+    for agentfile in args.agents:
+        with open(agentfile, 'rb') as f:
+            agent_source = f.read()
+        for ghost in args.ghosts:
+            for layout_name in args.layouts:
+                layout_text = str(layout.getLayout(layout_name))
+                for seed in range(1, args.seeds + 1):
+                    key = cell_key(agent_source, engine, ghost, layout_text,
+                                   seed, options)
+                    cells.append((key, agentfile, ghost, layout_name, seed,
+                                  args))
+
+    pending = [cell for cell in cells if cell[0] not in cache]
+    print("League: %d cells, %d cached, %d to play" %
+          (len(cells), len(cells) - len(pending), len(pending)))
+
+    # Results are appended as soon as they come, so that an interrupted
+    # league resumes where it stopped
+    with open(args.cache, 'a') as f:
+        if args.workers > 1 and len(pending) > 1:
+            with multiprocessing.Pool(args.workers) as pool:
+                results = pool.imap_unordered(play_cell, pending)
+                for i, (key, result) in enumerate(results, 1):
+                    cache[key] = result
+                    f.write(json.dumps({'key': key, 'result': result}) + '\n')
+                    f.flush()
+                    print("Played %d/%d" % (i, len(pending)))
+        else:
+            for i, cell in enumerate(pending, 1):
+                key, result = play_cell(cell)
+                cache[key] = result
+                f.write(json.dumps({'key': key, 'result': result}) + '\n')
+                f.flush()
+                print("Played %d/%d" % (i, len(pending)))
+
+    rows = []
+    for agentfile in args.agents:
+        for ghost in args.ghosts:
+            for layout_name in args.layouts:
+                results = [cache[cell[0]] for cell in cells
+                           if cell[1:4] == (agentfile, ghost, layout_name)]
+                games = [r for r in results if 'error' not in r]
+                row = [agentfile, ghost, layout_name, len(results),
+                       len(results) - len(games)]
+                if games:
+                    row += [
+                        statistics.mean(r['score'] for r in games),
+                        statistics.mean(r['win'] for r in games),
+                        sum(r['truncated'] is not None for r in games),
+                        statistics.mean(r['moves'] for r in games),
+                        statistics.mean(r['time'] for r in games),
+                        statistics.mean(r['expanded'] for r in games)]
+                else:
+                    row += [None] * 6
+                rows.append(row)
+    write_table(args.output, rows)
+
+    print("%-22s %-7s %-18s %6s %9s %6s %5s" %
+          ('Agent', 'Ghost', 'Layout', 'Errors', 'Score', 'Win', 'Trunc'))
+    for row in rows:
+        if row[5] is None:
+            print("%-22s %-7s %-18s %6d" % tuple(row[:3] + row[4:5]))
+        else:
+            print("%-22s %-7s %-18s %6d %9.1f %6.2f %5d" %
+                  tuple(row[:3] + row[4:8]))
+
+
+if __name__ == "__main__":
+    main()
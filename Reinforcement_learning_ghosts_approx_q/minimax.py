@@ -54,13 +54,15 @@ class PacmanAgent(Agent):
         # Add the current node to the visited set
         visited.add(self.__get_info(state))
 
-        successors = state.generatePacmanSuccessors()
-        for succ in successors:
+        # Play each move in place and take it back once explored
+        for action in state.expand(0):
+            token = state.apply(0, action)
             # Check if it was already visited
-            if self.__get_info(succ[0]) not in visited:
+            if self.__get_info(state) not in visited:
                 new_visited = visited.copy()
-                value = max(value, self.__min_value(succ[0], new_visited,
+                value = max(value, self.__min_value(state, new_visited,
                                                     ghost_index))
+            state.undo(token)
 
         if value == -math.inf:
             value = math.inf
@@ -88,16 +90,17 @@ class PacmanAgent(Agent):
         # Add the current node to the visited set
         visited.add(self.__get_info(state))
 
-        successors = state.generateGhostSuccessors(ghost_index)
-        for succ in successors:
-            if self.__get_info(succ[0]) not in visited:
+        for action in state.expand(ghost_index):
+            token = state.apply(ghost_index, action)
+            if self.__get_info(state) not in visited:
                 new_visited = visited.copy()
                 if ghost_index > 1:
-                    value = min(value, self.__min_value(succ[0], new_visited,
+                    value = min(value, self.__min_value(state, new_visited,
                                                         ghost_index-1))
                 else:
-                    value = min(value, self.__max_value(succ[0], new_visited,
+                    value = min(value, self.__max_value(state, new_visited,
                                                         self.nb_ghosts))
+            state.undo(token)
         if value == math.inf:
             value = -math.inf
 
@@ -127,9 +130,10 @@ class PacmanAgent(Agent):
         visited.add(self.__get_info(state))
 
         # For each successor of the current node
-        successors = state.generatePacmanSuccessors()
-        for next_state, next_action in successors:
-            value = self.__min_value(next_state, visited, self.nb_ghosts)
+        for next_action in state.expand(0):
+            token = state.apply(0, next_action)
+            value = self.__min_value(state, visited, self.nb_ghosts)
+            state.undo(token)
             if value > best_value:
                 best_value = value
                 best_action = next_action
@@ -0,0 +1,122 @@
+# distances.py
+# ------------
+# Exact maze distances between every pair of free cells of a layout.
+
+"""
+A DistanceOracle holds the maze distance (the number of moves of a
+shortest path) between every pair of free cells of a layout. Free cells are
+numbered in column order, and distances are stored in a uint16 matrix
+indexed by cell ids, computed once with a breadth-first search from every
+cell.
+
+Matrices are named by the fingerprint of the layout and cached with
+layout.loadCachedArray.
+"""
+
+import os
+
+import numpy as np
+
+from .util import nearestPoint
+
+# Distance between cells that cannot reach each other
+UNREACHABLE = np.iinfo(np.uint16).max
+
+
+class DistanceOracle:
+    """
+    Maze distances of `layout`. Positions are (x, y) grid points; positions
+    between two grid points (scared ghosts) are taken at the nearest one.
+    """
+
+    def __init__(self, layout):
+        from .layout import loadCachedArray
+        moveTable = layout.getMoveTable()
+        self.cells = [(x, y) for x in range(layout.width)
+                      for y in range(layout.height) if not layout.walls[x][y]]
+        self.cellIds = dict((cell, i) for i, cell in enumerate(self.cells))
+        # Ids of the cells reachable in one move, by cell id
+        self.neighbors = [
+            [self.cellIds[neighbor]
+             for neighbor in moveTable.getLegalNeighbors(cell)
+             if neighbor != cell]
+            for cell in self.cells]
+
+        n = len(self.cells)
+        self.matrix = loadCachedArray(
+            DistanceOracle.cacheName(layout), (n, n), np.uint16,
+            self.computeDistances)
+
+    @staticmethod
+    def cacheName(layout):
+        return 'distances-%s.u16' % layout.getFingerprint().hex()
+
+    @staticmethod
+    def isCached(layout):
+        """
+        Returns whether the distances of `layout` are saved in the cache, so
+        that loading them costs no search.
+        """
+        from .layout import CACHE_DIR
+        n = layout.walls.count(False)
+        path = os.path.join(CACHE_DIR, DistanceOracle.cacheName(layout))
+        try:
+            return os.path.getsize(path) == n * n * 2
+        except OSError:
+            return False
+
+    def computeDistances(self):
+        """
+        Returns the matrix of distances, with a breadth-first search from
+        every cell.
+        """
+        n = len(self.cells)
+        matrix = np.full((n, n), UNREACHABLE, dtype=np.uint16)
+        for source in range(n):
+            row = matrix[source]
+            row[source] = 0
+            fringe = [source]
+            distance = 0
+            while fringe:
+                distance += 1
+                nextFringe = []
+                for cell in fringe:
+                    for neighbor in self.neighbors[cell]:
+                        if row[neighbor] == UNREACHABLE:
+                            row[neighbor] = distance
+                            nextFringe.append(neighbor)
+                fringe = nextFringe
+        return matrix
+
+    def getCellId(self, pos):
+        cellId = self.cellIds.get(pos)
+        if cellId is None:
+            cellId = self.cellIds[nearestPoint(pos)]
+        return cellId
+
+    def distance(self, a, b):
+        """
+        Returns the maze distance between positions `a` and `b`, or inf if
+        they cannot reach each other.
+        """
+        d = self.matrix[self.getCellId(a), self.getCellId(b)]
+        if d == UNREACHABLE:
+            return float('inf')
+        return int(d)
+
+    def next_hop(self, a, b):
+        """
+        Returns the cell one move away from `a` on a shortest path to `b`
+        (`a` itself if `a` is `b`), or None if `b` cannot be reached.
+        """
+        i, j = self.getCellId(a), self.getCellId(b)
+        # Distances are symmetric: row j holds the distances to b
+        toB = self.matrix[j]
+        d = toB[i]
+        if d == UNREACHABLE:
+            return None
+        if d == 0:
+            return self.cells[i]
+        for neighbor in self.neighbors[i]:
+            if toB[neighbor] == d - 1:
+                return self.cells[neighbor]
@@ -25,7 +25,8 @@ import time
 import os
 import traceback
 import sys
-import pacman_module as pacmodule
+import collections
+import random
 
 #######################
 # Parts worth reading #
@@ -38,7 +39,31 @@ class Agent:
     following methods which will be called if they exist:
 
     def registerInitialState(self, state): # inspects the starting state
+
+    def get_anytime_actions(self, state): # yields better and better moves
+
+    def observe_start(self, state): # sees the starting state of each game
+
+    def observe_move(self, agentIndex, action, state): # sees every move
+
+    When the rules give an agent a move time, the agent must move before a
+    deadline (see GameState.getDeadline); node expansions and successors
+    generated past the deadline raise DeadlineExceededException, which cuts
+    the search off. An agent defining get_anytime_actions is asked for moves
+    through it instead of get_action, and plays the latest move yielded by
+    the deadline.
+
+    Agents draw their random numbers from `self.rng`, which the Game sets to
+    the random number generator of the game being played (the global
+    `random` module by default).
+
+    Agents that change themselves as they play, such as learning agents
+    updating their weights at every move, set `learns` to True: their games
+    depend on every game played before, so they cannot be spread over
+    processes (see pacman.runGames).
     """
+    rng = random
+    learns = False
 
     def __init__(self, index=0):
         self.index = index
@@ -88,6 +113,7 @@ class Configuration:
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos, direction):
         self.pos = pos
@@ -136,6 +162,8 @@ class AgentState:
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer',
+                 'numCarrying', 'numReturned')
 
     def __init__(self, startConfiguration, isPacman):
         self.start = startConfiguration
@@ -178,12 +206,18 @@ class AgentState:
 
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
-    via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
-    y vertical and the origin (0,0) in the bottom left corner.
+    A 2-dimensional array of booleans backed by a single arbitrary-precision
+    integer used as a bitset.  Data is accessed via grid[x][y] where (x,y) are
+    positions on a Pacman map with x horizontal, y vertical and the origin
+    (0,0) in the bottom left corner.
+
+    Cell (x,y) is stored in bit x * height + y, so hashing, comparing,
+    counting and copying a grid cost O(words) instead of O(cells).
 
     The __str__ method constructs an output that is oriented like a pacman board.
     """
+    __slots__ = ('width', 'height', 'bits')
+    CELLS_PER_INT = 30
 
     def __init__(
             self,
@@ -193,23 +227,30 @@ class Grid:
             bitRepresentation=None):
         if initialValue not in [False, True]:
             raise Exception('Grids can only contain booleans')
-        self.CELLS_PER_INT = 30
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(
-            height)] for x in range(width)]
+        self.bits = (1 << (width * height)) - 1 if initialValue else 0
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
     def __getitem__(self, i):
-        return self.data[i]
+        if i < 0:
+            i += self.width
+        if i < 0 or i >= self.width:
+            raise IndexError('Grid column index out of range')
+        return GridColumn(self, i * self.height)
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        column = self[key]
+        for y, value in enumerate(item):
+            column[y] = value
+
+    def __len__(self):
+        return self.width
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)]
+        out = [[str(self[x][y])[0] for x in range(self.width)]
                for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
@@ -217,41 +258,39 @@ class Grid:
     def __eq__(self, other):
         if other is None:
             return False
-        return self.data == other.data
+        return (self.bits == other.bits and self.width == other.width
+                and self.height == other.height)
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(self.bits)
 
     def copy(self):
         g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g.bits = self.bits
         return g
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
-        return g
+        return self.copy()
 
     def count(self, item=True):
-        return sum([x.count(item) for x in self.data])
+        n = bin(self.bits).count('1')
+        if item:
+            return n
+        return self.width * self.height - n
 
     def asList(self, key=True):
+        bits = self.bits
+        if not key:
+            bits ^= (1 << (self.width * self.height)) - 1
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key:
-                    list.append((x, y))
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            list.append(self._cellIndexToPosition(index))
+            bits ^= low
         return list
 
     def packBits(self):
@@ -264,8 +303,7 @@ class Grid:
         currentInt = 0
         for i in range(self.height * self.width):
             bit = self.CELLS_PER_INT - (i % self.CELLS_PER_INT) - 1
-            x, y = self._cellIndexToPosition(i)
-            if self[x][y]:
+            if (self.bits >> i) & 1:
                 currentInt += 2 ** bit
             if (i + 1) % self.CELLS_PER_INT == 0:
                 bits.append(currentInt)
@@ -274,7 +312,7 @@ class Grid:
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
-        x = index / self.height
+        x = index // self.height
         y = index % self.height
         return x, y
 
@@ -305,6 +343,46 @@ class Grid:
         return bools
 
 
+class GridColumn:
+    """
+    A view on one column of a Grid, so that grid[x][y] reads and writes
+    the underlying bitset in place.
+    """
+    __slots__ = ('grid', 'offset')
+
+    def __init__(self, grid, offset):
+        self.grid = grid
+        self.offset = offset
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.grid.height
+        if y < 0 or y >= self.grid.height:
+            raise IndexError('Grid row index out of range')
+        return (self.grid.bits >> (self.offset + y)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        if y < 0:
+            y += self.grid.height
+        if y < 0 or y >= self.grid.height:
+            raise IndexError('Grid row index out of range')
+        if value not in [False, True]:
+            raise Exception('Grids can only contain booleans')
+        mask = 1 << (self.offset + y)
+        if value:
+            self.grid.bits |= mask
+        else:
+            self.grid.bits &= ~mask
+
+    def __len__(self):
+        return self.grid.height
+
+    def __iter__(self):
+        column = self.grid.bits >> self.offset
+        for y in range(self.grid.height):
+            yield (column >> y) & 1 == 1
+
+
 def reconstituteGrid(bitRep):
     if not isinstance(bitRep, type((1, 2))):
         return bitRep
@@ -404,11 +482,261 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
+    def getGhostActions(possible, direction):
+        """
+        Ghosts cannot stop, and cannot turn around unless they
+        reach a dead end, but can turn 90 degrees at intersections.
+        """
+        possible = [action for action in possible
+                    if action != Directions.STOP]
+        reverse = Actions.reverseDirection(direction)
+        if reverse in possible and len(possible) > 1:
+            possible.remove(reverse)
+        return possible
+    getGhostActions = staticmethod(getGhostActions)
+
+
+class MoveTable:
+    """
+    The legal moves of every free cell of a layout, compiled once from its
+    walls so that the game rules only have to do table lookups.
+
+    Positions off the grid points (scared ghosts move at half speed) are not
+    in the tables and fall back to the `Actions` helpers. Cells off the grid
+    count as walls, so that layouts with open cells on their border load.
+    """
+
+    def __init__(self, walls, tables=None):
+        self.walls = walls
+        if tables is not None:
+            # Tables compiled before (see Layout.compile)
+            self.actions, self.ghostActions, self.neighbors = tables
+            return
+        # (x, y) -> legal actions, as Actions.getPossibleActions
+        self.actions = {}
+        # ((x, y), heading) -> legal ghost actions
+        self.ghostActions = {}
+        # (x, y) -> reachable cells, as Actions.getLegalNeighbors
+        self.neighbors = {}
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if walls[x][y]:
+                    continue
+                pos = (x, y)
+                possible = [direction for direction, (dx, dy)
+                            in Actions._directionsAsList
+                            if not self.isWall(x + dx, y + dy)]
+                self.actions[pos] = tuple(possible)
+                self.neighbors[pos] = tuple(
+                    Actions.getLegalNeighbors(pos, walls))
+                for heading in Actions._directions:
+                    self.ghostActions[(pos, heading)] = tuple(
+                        Actions.getGhostActions(possible, heading))
+
+    def isWall(self, x, y):
+        """
+        Returns whether (x, y) is a wall, cells off the grid included.
+        """
+        if 0 <= x < self.walls.width and 0 <= y < self.walls.height:
+            return self.walls[x][y]
+        return True
+
+    def getPossibleActions(self, config):
+        """
+        Returns the tuple of legal actions from a configuration.
+        """
+        possible = self.actions.get(config.pos)
+        if possible is None:
+            return tuple(Actions.getPossibleActions(config, self.walls))
+        return possible
+
+    def getGhostActions(self, config):
+        """
+        Returns the tuple of legal ghost actions from a configuration.
+        """
+        possible = self.ghostActions.get((config.pos, config.direction))
+        if possible is None:
+            possible = Actions.getPossibleActions(config, self.walls)
+            return tuple(Actions.getGhostActions(possible, config.direction))
+        return possible
+
+    def getLegalNeighbors(self, position):
+        """
+        Returns the tuple of cells reachable in one move from `position`.
+        """
+        neighbors = self.neighbors.get(position)
+        if neighbors is None:
+            return tuple(Actions.getLegalNeighbors(position, self.walls))
+        return neighbors
+
+
+ZOBRIST_MASK = (1 << 64) - 1
+ZOBRIST_FOOD = 1
+ZOBRIST_CAPSULE = 2
+ZOBRIST_AGENT = 3
+_ZOBRIST_DIRECTIONS = {Directions.NORTH: 0,
+                       Directions.SOUTH: 1,
+                       Directions.EAST: 2,
+                       Directions.WEST: 3,
+                       Directions.STOP: 4}
+_zobristKeys = {}
+
+
+def zobristKey(*code):
+    """
+    Returns the pseudo-random 64-bit Zobrist key of a tuple of integers.
+    Keys are derived with a splitmix64 mixer, so they are the same in every
+    process, and memoized since the same board features come up again and
+    again during a game.
+    """
+    key = _zobristKeys.get(code)
+    if key is None:
+        key = 0
+        for c in code:
+            key = (key ^ c) & ZOBRIST_MASK
+            key = (key + 0x9E3779B97F4A7C15) & ZOBRIST_MASK
+            key = ((key ^ (key >> 30)) * 0xBF58476D1CE4E5B9) & ZOBRIST_MASK
+            key = ((key ^ (key >> 27)) * 0x94D049BB133111EB) & ZOBRIST_MASK
+            key = key ^ (key >> 31)
+        _zobristKeys[code] = key
+    return key
+
+
+def zobristAgentKey(index, agentState):
+    """
+    Returns the Zobrist key of an agent state. Positions are doubled so that
+    the half-steps of scared ghosts get their own keys.
+    """
+    configuration = agentState.configuration
+    if configuration is None:
+        return zobristKey(ZOBRIST_AGENT, index)
+    x, y = configuration.pos
+    return zobristKey(
+        ZOBRIST_AGENT,
+        index,
+        int(round(2 * x)),
+        int(round(2 * y)),
+        _ZOBRIST_DIRECTIONS[configuration.direction],
+        agentState.scaredTimer)
+
+
+class ExpansionContext:
+    """
+    Node expansion accounting of one game: the number of nodes expanded
+    during the current move, the node budget and the states explored.
+
+    Every state of a game carries the context of the game, and successors
+    and observations share it, so that games played in threads or
+    interleaved in one process keep separate budgets.
+
+    Tracking of the explored states is off by default; setExploredTracking
+    turns on one of the modes below:
+
+      - 'count': only counts the successors generated;
+      - 'ring':  keeps the last `size` successors generated;
+      - 'cells': keeps the Pacman cells of the successors generated, in
+                 order of first visit, for drawExpandedCells;
+      - 'all':   keeps every state generated (unbounded).
+
+    In every mode `numExplored` counts the successors generated.
+
+    While an agent has a move deadline (a time.monotonic() value), node
+    expansions and successor generations (generateSuccessor and apply
+    included) raise DeadlineExceededException once it has passed.
+    """
+    __slots__ = ('countExpanded', 'maximumExpanded', 'deadline', 'explored',
+                 'numExplored', 'trackMode', 'trackSize', 'track')
+
+    TRACK_MODES = (None, 'count', 'ring', 'cells', 'all')
+
+    def __init__(self, maximumExpanded=float('inf')):
+        self.countExpanded = 0
+        self.maximumExpanded = maximumExpanded
+        self.deadline = None
+        self.explored = None
+        self.setExploredTracking(None)
+
+    def resetNodeExpansionCounter(self):
+        self.countExpanded = 0
+
+    def setMaximumExpanded(self, m):
+        self.maximumExpanded = m
+
+    def setExploredTracking(self, mode, size=1000):
+        """
+        Selects how the states generated are tracked (see above); `size` is
+        the capacity of the 'ring' mode. Resets the explored states.
+        """
+        if mode not in self.TRACK_MODES:
+            raise Exception("Unknown explored tracking mode: %s" % str(mode))
+        self.trackMode = mode
+        self.trackSize = size
+        if mode is None:
+            self.track = None
+        elif mode == 'count':
+            self.track = self._trackCount
+        elif mode == 'ring':
+            self.track = self._trackRing
+        elif mode == 'cells':
+            self.track = self._trackCells
+        else:
+            self.track = self._trackAll
+        self.getAndResetExplored()
+
+    def getAndResetExplored(self):
+        """
+        Returns the explored states (a set in mode 'all', a list of the
+        latest states in mode 'ring'), or the list of explored Pacman cells
+        in mode 'cells', and starts afresh.
+        """
+        tmp = self.explored
+        if self.trackMode == 'all':
+            self.explored = set()
+        elif self.trackMode == 'ring':
+            self.explored = collections.deque(maxlen=self.trackSize)
+        elif self.trackMode == 'cells':
+            self.explored = {}
+        else:
+            self.explored = None
+        self.numExplored = 0
+        if tmp is None:
+            return []
+        elif isinstance(tmp, set):
+            return tmp
+        return list(tmp)
+
+    def _trackCount(self, state, successor):
+        self.numExplored += 1
+
+    def _trackRing(self, state, successor):
+        self.numExplored += 1
+        self.explored.append(successor)
+
+    def _trackCells(self, state, successor):
+        self.numExplored += 1
+        self.explored[successor.data.agentStates[0].configuration.pos] = None
+
+    def _trackAll(self, state, successor):
+        self.numExplored += 1
+        self.explored.add(state)
+        self.explored.add(successor)
+
 
 class GameStateData:
     """
+    The data of a GameState.
 
+    The hash of the state is maintained incrementally with Zobrist keys:
+    every rule that changes the food, the capsules or an agent state XORs
+    the old and new keys into `_hash` (see the `hash*` methods), so that
+    hashing a state is O(1).
+
+    The expansion context of the game is shared by all the states derived
+    from the initial one.
     """
+    __slots__ = ('food', 'capsules', 'agentStates', 'layout', 'score',
+                 'scoreChange', 'context', '_eaten', '_hash', '_foodEaten',
+                 '_foodAdded', '_capsuleEaten', '_agentMoved', '_lose', '_win')
 
     def __init__(self, prevState=None):
         """
@@ -421,6 +749,11 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._hash = prevState._hash
+            self.context = prevState.context
+        else:
+            self._hash = 0
+            self.context = ExpansionContext()
 
         self._foodEaten = None
         self._foodAdded = None
@@ -430,16 +763,25 @@ class GameStateData:
         self._win = False
         self.scoreChange = 0
 
-    def deepCopy(self):
+    def snapshot(self):
+        """
+        Returns a copy-on-write copy of the data. The layout is shared and
+        the food grid is only copied once written to, while agent states
+        and capsules are copied since they are small.
+        """
         state = GameStateData(self)
-        state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def deepCopy(self):
+        state = self.snapshot()
+        state.food = self.food.deepCopy()
+        state.layout = self.layout.deepCopy()
+        return state
+
     def copyAgentStates(self, agentStates):
         copiedStates = []
         for agentState in agentStates:
@@ -467,31 +809,46 @@ class GameStateData:
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate(self.agentStates):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                # hash(state)
-        return int(
-            (hash(
-                tuple(
-                    self.agentStates)) +
-                13 *
-                hash(
-                self.food) +
-                113 *
-                hash(
-                tuple(
-                    self.capsules)) +
-                7 *
-                hash(
-                self.score)) %
-            1048575)
+        return hash((self._hash, self.score))
+
+    def computeHash(self):
+        """
+        Computes the Zobrist key of the state from scratch.
+        """
+        key = 0
+        height = self.layout.height
+        for x, y in self.food.asList():
+            key ^= zobristKey(ZOBRIST_FOOD, x * height + y)
+        for x, y in self.capsules:
+            key ^= zobristKey(ZOBRIST_CAPSULE, x * height + y)
+        for index, agentState in enumerate(self.agentStates):
+            key ^= zobristAgentKey(index, agentState)
+        return key
+
+    def hashFood(self, position):
+        """
+        Toggles the food dot at `position` in the incremental hash.
+        """
+        x, y = position
+        self._hash ^= zobristKey(ZOBRIST_FOOD, x * self.layout.height + y)
+
+    def hashCapsule(self, position):
+        """
+        Toggles the capsule at `position` in the incremental hash.
+        """
+        x, y = position
+        self._hash ^= zobristKey(ZOBRIST_CAPSULE, x * self.layout.height + y)
+
+    def hashAgent(self, index):
+        """
+        Toggles the state of agent `index` in the incremental hash. Call it
+        once before and once after changing the agent state.
+        """
+        self._hash ^= zobristAgentKey(index, self.agentStates[index])
 
     def __str__(self):
         width, height = self.layout.width, self.layout.height
-        map = Grid(width, height)
+        map = [[' ' for y in range(height)] for x in range(width)]
         if isinstance(self.food, type((1, 2))):
             self.food = reconstituteGrid(self.food)
         for x in range(width):
@@ -514,7 +871,10 @@ class GameStateData:
         for x, y in self.capsules:
             map[x][y] = 'o'
 
-        return str(map) + ("\nScore: %d\n" % self.score)
+        out = [[map[x][y] for x in range(width)] for y in range(height)]
+        out.reverse()
+        board = '\n'.join([''.join(x) for x in out])
+        return board + ("\nScore: %d\n" % self.score)
 
     def _foodWallStr(self, hasFood, hasWall):
         if hasFood:
@@ -569,6 +929,7 @@ class GameStateData:
                         Directions.STOP),
                     isPacman))
         self._eaten = [False for a in self.agentStates]
+        self._hash = self.computeHash()
 
 
 try:
@@ -582,6 +943,9 @@ class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
     """
+    # Reasons the rules may truncate a game for, in Game.truncated
+    TRUNCATED_MOVES = 'moves'
+    TRUNCATED_STALL = 'stall'
 
     def __init__(
             self,
@@ -590,17 +954,28 @@ class Game:
             rules,
             startingIndex=0,
             muteAgents=False,
-            catchExceptions=False):
+            catchExceptions=False,
+            deepCopyObservations=False,
+            rng=None):
         self.agentCrashed = False
         self.agents = agents
         self.display = display
         self.rules = rules
         self.startingIndex = startingIndex
         self.gameOver = False
+        # Set when the rules cut the game short, neither won nor lost
+        self.truncated = None
+        self.stallDetector = None
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
+        self.deepCopyObservations = deepCopyObservations
+        # Random number generator of the game, handed to the agents
+        self.rng = rng
         self.moveHistory = []
+        # Optional GameRecorder (see recording.py) the moves are written to
+        self.recorder = None
         self.totalAgentTimes = [0 for agent in agents]
+        self.totalExpandedNodes = 0
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
         import io
@@ -641,6 +1016,56 @@ class Game:
         sys.stdout = OLD_STDOUT
         sys.stderr = OLD_STDERR
 
+    @staticmethod
+    def getAgentAction(agent, observation, moveTime):
+        """
+        Solicits the move of `agent`, before a deadline `moveTime` seconds
+        from now if `moveTime` is not None. Returns None if the agent has no
+        move by then: moves yielded or returned past the deadline are too
+        late and are not played.
+        """
+        if moveTime is None:
+            return agent.get_action(observation)
+
+        context = observation.data.context
+        deadline = time.monotonic() + moveTime
+        context.deadline = deadline
+        action = None
+        try:
+            if hasattr(agent, 'get_anytime_actions'):
+                actions = agent.get_anytime_actions(observation)
+                try:
+                    for move in actions:
+                        if time.monotonic() >= deadline:
+                            break
+                        action = move
+                finally:
+                    # Anytime agents may return any iterable, not only
+                    # generators
+                    close = getattr(actions, 'close', None)
+                    if close is not None:
+                        close()
+            else:
+                action = agent.get_action(observation)
+                if time.monotonic() >= deadline:
+                    action = None
+        except DeadlineExceededException:
+            pass
+        finally:
+            context.deadline = None
+        if action is None and time.monotonic() >= deadline:
+            print("Move deadline exceeded !")
+        return action
+
+    def seedAgents(self):
+        """
+        Hands the random number generator of the game to the agents, once
+        per game. In an unseeded game, the agents draw from the global
+        `random` module again, whatever game they played before.
+        """
+        for agent in self.agents:
+            agent.rng = random if self.rng is None else self.rng
+
     def run(self):
         """
         Main control loop for game play.
@@ -652,47 +1077,61 @@ class Game:
         numAgents = len(self.agents)
         previous_action = Directions.STOP
         expout = int(self.rules.getMoveTimeout(agentIndex))
+        moveTimes = [self.rules.getMoveTime(i) for i in range(numAgents)]
         totalComputationTime = 0
         totalExpandedNodes = 0
+        context = self.state.data.context
         if (expout > 0):
-            pacmodule.pacman.GameState.setMaximumExpanded(expout)
+            context.setMaximumExpanded(expout)
+        self.seedAgents()
+        observers = [agent for agent in self.agents
+                     if hasattr(agent, 'observe_move')]
+        for observer in observers:
+            observer.observe_start(self.state)
         while not self.gameOver:
             # Fetch the next agent
             agent = self.agents[agentIndex]
             move_time = 0
             skip_action = False
             # Generate an observation of the state
-            observation = self.state.deepCopy()
+            if self.deepCopyObservations:
+                observation = self.state.deepCopy()
+            else:
+                observation = self.state.snapshot()
 
             # Solicit an action
             action = None
             self.mute(agentIndex)
-            pacmodule.pacman.GameState.resetNodeExpansionCounter()
+            context.resetNodeExpansionCounter()
             violated = False
             t = time.time()
-            if expout == 0:
-                action = agent.get_action(observation)
-            else:
-                #TODO : node expansion control through getSuccessors
-                action = agent.get_action(observation)
-                if pacmodule.pacman.GameState.countExpanded > expout:
-                    violated = True
-            totalComputationTime += (time.time() - t)
-            totalExpandedNodes += pacmodule.pacman.GameState.countExpanded
-            if action not in self.state.getLegalActions(agentIndex):
+            action = self.getAgentAction(
+                agent, observation, moveTimes[agentIndex])
+            if expout and context.countExpanded > expout:
+                violated = True
+            move_time = time.time() - t
+            totalComputationTime += move_time
+            self.totalAgentTimes[agentIndex] += move_time
+            totalExpandedNodes += context.countExpanded
+            legal = self.state.getLegalActions(agentIndex)
+            if action not in legal:
                 print("Illegal move !")
                 action = previous_action
             elif violated:
                 print("Node expansion budget violated !")
                 action = previous_action
 
-            if action not in self.state.getLegalActions(agentIndex):
+            if action not in legal:
                 action = Directions.STOP
             self.unmute()
             # Execute the action
             self.moveHistory.append((agentIndex, action))
+            if self.recorder is not None:
+                self.recorder.recordMove(action)
             previous_action = action
             self.state = self.state.generateSuccessor(agentIndex, action)
+            for observer in observers:
+                observer.observe_move(agentIndex, action, self.state)
 
             # Change the display
             self.display.update(self.state.data)
@@ -701,8 +1140,8 @@ class Game:
 
             # Allow for game specific conditions (winning, losing, etc.)
             self.rules.process(self.state, self)
-            # Track progress
-            if agentIndex == numAgents + 1:
+            # Track progress: a move is a round of all the agents
+            if agentIndex == numAgents - 1:
                 self.numMoves += 1
             # Next agent
             agentIndex = (agentIndex + 1) % numAgents
@@ -713,4 +1152,86 @@ class Game:
         totalScore = self.state.getScore()
 
         self.display.finish()
+        self.totalExpandedNodes = totalExpandedNodes
         return totalScore,totalComputationTime,totalExpandedNodes
+
+    def runTurbo(self):
+        """
+        Headless control loop for training and evaluation.
+
+        Plays the same game as run, but without display updates, output
+        muting, timing or progress reports. Returns the same tuple as run,
+        with a computation time of 0.
+
+        Agents searching with apply/undo modify the state they observe in
+        place, and only restore it when their search completes. Agents are
+        handed a snapshot whenever their search may stop midway: under a
+        move deadline or an expansion budget, or with catchExceptions set.
+        Otherwise they observe the game state itself, and must leave it as
+        they found it.
+        """
+        self.numMoves = 0
+
+        agents = self.agents
+        rules = self.rules
+        moveHistory = self.moveHistory
+        recorder = self.recorder
+        state = self.state
+        agentIndex = self.startingIndex
+        numAgents = len(agents)
+        previous_action = Directions.STOP
+        expout = int(rules.getMoveTimeout(agentIndex))
+        moveTimes = [rules.getMoveTime(i) for i in range(numAgents)]
+        totalExpandedNodes = 0
+        context = state.data.context
+        if (expout > 0):
+            context.setMaximumExpanded(expout)
+        # Searches that may be cut off search a snapshot
+        interruptible = expout > 0 or self.catchExceptions
+        self.seedAgents()
+        observers = [agent for agent in agents
+                     if hasattr(agent, 'observe_move')]
+        for observer in observers:
+            observer.observe_start(state)
+        while not self.gameOver:
+            moveTime = moveTimes[agentIndex]
+            if self.deepCopyObservations:
+                observation = state.deepCopy()
+            elif interruptible or moveTime is not None:
+                observation = state.snapshot()
+            else:
+                observation = state
+
+            context.countExpanded = 0
+            agent = agents[agentIndex]
+            if moveTime is None:
+                action = agent.get_action(observation)
+            else:
+                action = self.getAgentAction(agent, observation, moveTime)
+            totalExpandedNodes += context.countExpanded
+            legal = state.getLegalActions(agentIndex)
+            if action not in legal:
+                print("Illegal move !")
+                action = previous_action
+            elif expout != 0 and context.countExpanded > expout:
+                print("Node expansion budget violated !")
+                action = previous_action
+
+            if action not in legal:
+                action = Directions.STOP
+            moveHistory.append((agentIndex, action))
+            if recorder is not None:
+                recorder.recordMove(action)
+            previous_action = action
+            state = state.generateSuccessor(agentIndex, action)
+            self.state = state
+            for observer in observers:
+                observer.observe_move(agentIndex, action, state)
+
+            rules.process(state, self)
+            if agentIndex == numAgents - 1:
+                self.numMoves += 1
+            agentIndex = (agentIndex + 1) % numAgents
+
+        self.totalExpandedNodes = totalExpandedNodes
+        return state.getScore(), 0, totalExpandedNodes
@@ -0,0 +1,137 @@
+# junctions.py
+# ------------
+# Layouts contracted into graphs of junctions joined by corridors.
+
+"""
+Most free cells of a maze are corridor cells, with exactly two neighbors:
+an agent entering one can only go on or turn back. A JunctionGraph keeps
+the other cells, junctions and dead ends, as its nodes, and contracts the
+corridors between them into edges weighted by their length.
+
+Each edge records the moves that follow it and the cells it goes through,
+as a bitmask in the bit order of game.Grid, so that the food left on it is
+counted with one AND. Edges are also macro-actions: "follow the corridor
+to the next junction", which searches over the graph expand instead of the
+cells of the corridor (see GameState.generatePacmanMacroSuccessors).
+
+Corridors closed on themselves, without junction, get one of their cells
+as a node.
+"""
+
+from .game import Actions, Directions
+
+
+class Edge:
+    """
+    A corridor followed from `start` to `end`, with the `actions` taking an
+    agent there (their number is the length of the edge) and the `cells`
+    entered on the way, `end` last.
+
+    `mask` holds the cells of the corridor strictly between `start` and
+    `end`, and `food` the number of them with food in the layout.
+    """
+    __slots__ = ('start', 'end', 'actions', 'cells', 'mask', 'food')
+
+    def __init__(self, start, end, actions, cells, height, food):
+        self.start = start
+        self.end = end
+        self.actions = actions
+        self.cells = cells
+        self.mask = 0
+        for x, y in cells[:-1]:
+            self.mask |= 1 << (x * height + y)
+        self.food = bin(self.mask & food.bits).count('1')
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __repr__(self):
+        return "Edge(%s -> %s, length %d, food %d)" % (
+            self.start, self.end, len(self.actions), self.food)
+
+
+class JunctionGraph:
+    """
+    The junction graph of `layout`: `nodes` are its junctions and dead
+    ends, and `edges` maps every node to the edges leaving it, one per
+    legal move.
+    """
+
+    def __init__(self, layout):
+        self.height = layout.height
+        self.food = layout.food
+        moveTable = layout.getMoveTable()
+        # Legal moves of every free cell, STOP aside
+        self.moves = dict(
+            (pos, tuple(action for action in actions
+                        if action != Directions.STOP))
+            for pos, actions in moveTable.actions.items())
+        self.nodes = [pos for pos, moves in sorted(self.moves.items())
+                      if len(moves) != 2]
+        self.nodeSet = set(self.nodes)
+        self.edges = {}
+        # Macro-actions of the corridor cells, built on first use
+        self.macros = {}
+
+        covered = set(self.nodes)
+        for node in self.nodes:
+            self.addEdges(node, covered)
+        # Cells left are on corridors closed on themselves
+        for pos in sorted(self.moves):
+            if pos not in covered:
+                self.nodes.append(pos)
+                self.nodeSet.add(pos)
+                covered.add(pos)
+                self.addEdges(pos, covered)
+
+    def addEdges(self, node, covered):
+        self.edges[node] = [self.follow(node, action)
+                            for action in self.moves[node]]
+        for edge in self.edges[node]:
+            covered.update(edge.cells)
+
+    def follow(self, pos, action):
+        """
+        Returns the edge starting with `action` from `pos` and following the
+        corridor to the next node.
+        """
+        start = pos
+        actions = []
+        cells = []
+        while True:
+            dx, dy = Actions.directionToVector(action)
+            pos = (int(pos[0] + dx), int(pos[1] + dy))
+            actions.append(action)
+            cells.append(pos)
+            if pos in self.nodeSet or pos == start:
+                break
+            reverse = Directions.REVERSE[action]
+            action = next(move for move in self.moves[pos] if move != reverse)
+        return Edge(start, pos, actions, cells, self.height, self.food)
+
+    def isNode(self, pos):
+        return pos in self.nodeSet
+
+    def getMacroActions(self, pos):
+        """
+        Returns the edges an agent at `pos` can follow: the edges of `pos`
+        if it is a node, the corridor to the nodes on either side of it
+        otherwise.
+        """
+        edges = self.edges.get(pos)
+        if edges is None:
+            edges = self.macros.get(pos)
+            if edges is None:
+                edges = self.macros[pos] = [self.follow(pos, action)
+                                            for action in self.moves[pos]]
+        return edges
+
+    def getFood(self, edge, food):
+        """
+        Returns the number of cells of `edge` (its ends aside) with food in
+        the food grid `food`.
+        """
+        return bin(edge.mask & food.bits).count('1')
+
+    def getNumEdges(self):
+        return sum(len(edges) for edges in self.edges.values())
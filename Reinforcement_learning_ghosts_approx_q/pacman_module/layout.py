@@ -14,16 +14,35 @@
 
 from .util import manhattanDistance
 from .game import Grid
+from .game import MoveTable
+from .game import Actions
+from .distances import DistanceOracle
+from .visibility import VisibilityIndex
+from .junctions import JunctionGraph
 import os
+import json
 import random
-from functools import reduce
+import hashlib
+import threading
 
-VISIBILITY_MATRIX_CACHE = {}
+import numpy as np
+
+LAYOUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'layouts')
+# Compiled layouts (see Layout.compile) are cached in this directory
+CACHE_DIR = os.environ.get(
+    'PACMAN_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'pacman_module'))
+# Version of the compiled form, part of the name of cached files
+COMPILED_VERSION = 2
 
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts loaded by getLayout are shared by every game played on them in
+    the process, and must not be modified.
     """
 
     def __init__(self, layoutText):
@@ -37,43 +56,128 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
-        # self.initializeVisibilityMatrix()
+        self.moveTable = None
+        self.distances = None
+        self.visibility = None
+        self.junctions = None
+        self.fingerprint = None
 
     def getNumGhosts(self):
         return self.numGhosts
 
+    def getMoveTable(self):
+        """
+        Returns the compiled legal moves of the layout (see game.MoveTable),
+        built on first use.
+        """
+        if self.moveTable is None:
+            self.moveTable = MoveTable(self.walls)
+        return self.moveTable
+
+    def getDistances(self, build=True):
+        """
+        Returns the maze distances between the cells of the layout (see
+        distances.DistanceOracle), loaded on first use.
+
+        Computing them costs a search from every cell. If `build` is False,
+        they are only returned when already loaded or saved in the cache,
+        and None is returned otherwise.
+        """
+        if self.distances is None:
+            if not build and not DistanceOracle.isCached(self):
+                return None
+            self.distances = DistanceOracle(self)
+        return self.distances
+
+    def getVisibility(self):
+        """
+        Returns the line-of-sight visibility between the cells of the layout
+        (see visibility.VisibilityIndex), loaded on first use.
+        """
+        if self.visibility is None:
+            self.visibility = VisibilityIndex(self)
+        return self.visibility
+
+    def getJunctions(self):
+        """
+        Returns the layout with its corridors contracted into edges between
+        junctions and dead ends (see junctions.JunctionGraph), built on
+        first use.
+        """
+        if self.junctions is None:
+            self.junctions = JunctionGraph(self)
+        return self.junctions
+
+    def getFingerprint(self):
+        """
+        Returns a 16-byte digest of the layout text, identifying the layout
+        in recordings and caches.
+        """
+        if self.fingerprint is None:
+            self.fingerprint = hashlib.blake2b(
+                "\n".join(self.layoutText).encode(), digest_size=16).digest()
+        return self.fingerprint
+
+    def compile(self):
+        """
+        Returns the compiled form of the layout: its walls and food
+        bitmaps, capsules, agent starts and legal moves, from which
+        fromCompiled rebuilds it without parsing the text.
+
+        The compiled form holds plain JSON values only: bitmaps are hex
+        strings, and the legal moves are listed by cell as [x, y, actions,
+        neighbors, ghost actions by heading].
+        """
+        moveTable = self.getMoveTable()
+        moves = [[x, y, list(actions),
+                  [list(neighbor) for neighbor in moveTable.neighbors[x, y]],
+                  dict((heading, list(moveTable.ghostActions[(x, y), heading]))
+                       for heading in Actions._directions)]
+                 for (x, y), actions in moveTable.actions.items()]
+        return {'width': self.width,
+                'height': self.height,
+                'walls': '%x' % self.walls.bits,
+                'food': '%x' % self.food.bits,
+                'capsules': [list(pos) for pos in self.capsules],
+                'agentPositions': [[isPacman, list(pos)] for isPacman, pos
+                                   in self.agentPositions],
+                'numGhosts': self.numGhosts,
+                'moves': moves}
+
+    @staticmethod
+    def fromCompiled(layoutText, compiled):
+        """
+        Rebuilds the layout of `layoutText` from its compiled form.
+        """
+        layout = Layout.__new__(Layout)
+        layout.width = compiled['width']
+        layout.height = compiled['height']
+        layout.walls = Grid(layout.width, layout.height)
+        layout.walls.bits = int(compiled['walls'], 16)
+        layout.food = Grid(layout.width, layout.height)
+        layout.food.bits = int(compiled['food'], 16)
+        layout.capsules = [tuple(pos) for pos in compiled['capsules']]
+        layout.agentPositions = [(isPacman, tuple(pos)) for isPacman, pos
+                                 in compiled['agentPositions']]
+        layout.numGhosts = compiled['numGhosts']
+        layout.layoutText = layoutText
+        layout.totalFood = layout.food.count()
+        actions, ghostActions, neighbors = {}, {}, {}
+        for x, y, possible, reachable, byHeading in compiled['moves']:
+            actions[x, y] = tuple(possible)
+            neighbors[x, y] = tuple(tuple(cell) for cell in reachable)
+            for heading, legal in byHeading.items():
+                ghostActions[(x, y), heading] = tuple(legal)
+        layout.moveTable = MoveTable(layout.walls,
+                                     (actions, ghostActions, neighbors))
+        layout.distances = None
+        layout.visibility = None
+        layout.junctions = None
+        layout.fingerprint = None
+        return layout
+
     def initializeVisibilityMatrix(self):
-        global VISIBILITY_MATRIX_CACHE
-        if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
-            from .game import Directions
-            vecs = [(-0.5, 0), (0.5, 0), (0, -0.5), (0, 0.5)]
-            dirs = [
-                Directions.NORTH,
-                Directions.SOUTH,
-                Directions.WEST,
-                Directions.EAST]
-            vis = Grid(self.width,
-                       self.height,
-                       {Directions.NORTH: set(),
-                        Directions.SOUTH: set(),
-                        Directions.EAST: set(),
-                        Directions.WEST: set(),
-                        Directions.STOP: set()})
-            for x in range(self.width):
-                for y in range(self.height):
-                    if not self.walls[x][y]:
-                        for vec, direction in zip(vecs, dirs):
-                            dx, dy = vec
-                            nextx, nexty = x + dx, y + dy
-                            while (nextx + nexty) != int(nextx) + \
-                                    int(nexty) or not self.walls[int(nextx)][int(nexty)]:
-                                vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
-            self.visibility = vis
-            VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
-        else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(
-                str.__add__, self.layoutText)]
+        self.getVisibility()
 
     def isWall(self, pos):
         x, col = pos
@@ -99,14 +203,20 @@ class Layout:
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
-        row, col = [int(x) for x in pacPos]
-        return ghostPos in self.visibility[row][col][pacDirection]
+        return self.getVisibility().isVisible(pacPos, pacDirection, ghostPos)
 
     def __str__(self):
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        layout = Layout.__new__(Layout)
+        layout.__dict__.update(self.__dict__)
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        layout.layoutText = self.layoutText[:]
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -147,27 +257,100 @@ class Layout:
 
 
 def getLayout(name, back=2):
-    if name.endswith('.lay'):
-        layout = tryToLoad('pacman_module/layouts/' + name)
-        if layout is None:
-            layout = tryToLoad(name)
-    else:
-        layout = tryToLoad('pacman_module/layouts/' + name + '.lay')
-        if layout is None:
-            layout = tryToLoad(name + '.lay')
-    if layout is None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back - 1)
-        os.chdir(curdir)
-    return layout
+    """
+    Returns the layout `name` (with or without the .lay extension), looked
+    for in the `pacman_module/layouts` folder or as a path, from the current
+    directory and then up to `back` + 1 parent directories, and at last in
+    the layouts of this package. Returns None if it is not found.
+    """
+    if not name.endswith('.lay'):
+        name = name + '.lay'
+    for level in range(back + 2):
+        prefix = os.path.join(os.curdir, *[os.pardir] * level)
+        for path in (os.path.join(prefix, 'pacman_module', 'layouts', name),
+                     os.path.join(prefix, name)):
+            layout = tryToLoad(path)
+            if layout is not None:
+                return layout
+    return tryToLoad(os.path.join(LAYOUT_DIR, name))
+
+
+# Layouts loaded in this process, by path: (modification time, size, layout)
+_registry = {}
+_registryLock = threading.Lock()
 
 
 def tryToLoad(fullname):
-    if(not os.path.exists(fullname)):
+    """
+    Returns the layout of the file `fullname`, or None if there is no such
+    file. Each file is parsed once per process (again if it is modified),
+    and only compiled once while its compiled form stays in CACHE_DIR.
+    """
+    try:
+        stat = os.stat(fullname)
+    except OSError:
         return None
-    f = open(fullname)
+    path = os.path.abspath(fullname)
+    with _registryLock:
+        entry = _registry.get(path)
+    if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        return entry[2]
+
+    with open(fullname) as f:
+        layoutText = [line.strip() for line in f]
+    layout = loadCompiled(layoutText)
+    with _registryLock:
+        _registry[path] = (stat.st_mtime_ns, stat.st_size, layout)
+    return layout
+
+
+def loadCachedArray(name, shape, dtype, compute):
+    """
+    Returns the array saved as `name` in CACHE_DIR, memory-mapped, so that
+    the processes using it share one copy. If it is not there, computes it
+    with `compute` and saves it first.
+    """
+    path = os.path.join(CACHE_DIR, name)
+    try:
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+    except (OSError, ValueError):
+        pass
+    array = compute()
+    # The cache is an optimization: failing to write it is no error
     try:
-        return Layout([line.strip() for line in f])
-    finally:
-        f.close()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmpPath = '%s.%d.tmp' % (path, os.getpid())
+        array.tofile(tmpPath)
+        os.replace(tmpPath, path)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+    except OSError:
+        return array
+
+
+def loadCompiled(layoutText):
+    """
+    Returns the layout of `layoutText`, rebuilt from its compiled form in
+    CACHE_DIR if it is there, and parsed and compiled there otherwise.
+    """
+    fingerprint = hashlib.blake2b(
+        "\n".join(layoutText).encode(), digest_size=16).digest()
+    cacheFile = os.path.join(CACHE_DIR, 'layout-%d-%s.json' %
+                             (COMPILED_VERSION, fingerprint.hex()))
+    # The cache is an optimization: a missing, truncated, stale or foreign
+    # cache file is parsed again and overwritten, and failing to write it
+    # is no error. It is JSON, so that reading it never runs code
+    try:
+        with open(cacheFile) as f:
+            layout = Layout.fromCompiled(layoutText, json.load(f))
+    except Exception:
+        layout = Layout(layoutText)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmpFile = '%s.%d.tmp' % (cacheFile, os.getpid())
+            with open(tmpFile, 'w') as f:
+                json.dump(layout.compile(), f, separators=(',', ':'))
+            os.replace(tmpFile, cacheFile)
+        except Exception:
+            pass
+    layout.fingerprint = fingerprint
+    return layout
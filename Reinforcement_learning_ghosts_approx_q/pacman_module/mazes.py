@@ -0,0 +1,154 @@
+# mazes.py
+# --------
+# Procedural layouts, and transforms of layouts, built in memory.
+
+"""
+generateLayout builds a random maze: a spanning tree of corridors carved
+by a randomized depth-first search, with some of the remaining inner walls
+knocked down to make loops, then food, capsules, Pacman and the ghosts
+dropped on its free cells. The same arguments and seed always give the
+same maze.
+
+padBorders, tileLayout and mirrorLayout derive a new layout from the text
+of another one. All of them return Layout objects and never write layout
+files.
+"""
+
+import random
+
+from .layout import Layout
+from .util import manhattanDistance
+
+# Layout characters of agents
+_AGENTS = 'PG1234'
+
+
+def generateLayout(width, height, seed=None, loops=0.1, food=0.5,
+                   capsules=2, ghosts=1):
+    """
+    Returns a random `width` x `height` maze, walls included.
+
+    Arguments:
+    ----------
+    - `seed`: seed of the maze (a random maze if None).
+    - `loops`: fraction of the inner walls between two corridors that are
+               knocked down; 0 gives a perfect maze, without loops.
+    - `food`: fraction of the free cells with food (at least one has).
+    - `capsules`: number of capsules.
+    - `ghosts`: number of ghosts, started away from Pacman.
+    """
+    if width < 5 or height < 5:
+        raise Exception("Mazes must be at least 5 x 5")
+    rng = random.Random(seed)
+    rows = [['%'] * width for _ in range(height)]
+
+    # Corridor cells are on odd coordinates; carve a spanning tree of them
+    cells = [(x, y) for x in range(1, width - 1, 2)
+             for y in range(1, height - 1, 2)]
+    start = rng.choice(cells)
+    rows[start[1]][start[0]] = ' '
+    stack = [start]
+    while stack:
+        x, y = stack[-1]
+        unvisited = [(x + dx, y + dy) for dx, dy in
+                     ((0, 2), (0, -2), (2, 0), (-2, 0))
+                     if 0 < x + dx < width - 1 and 0 < y + dy < height - 1
+                     and rows[y + dy][x + dx] == '%']
+        if not unvisited:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(unvisited)
+        rows[(y + ny) // 2][(x + nx) // 2] = ' '
+        rows[ny][nx] = ' '
+        stack.append((nx, ny))
+
+    # Knock down inner walls between two corridors to make loops
+    walls = [(x, y) for x in range(1, width - 1) for y in range(1, height - 1)
+             if rows[y][x] == '%' and (x + y) % 2 == 1 and
+             ((rows[y][x - 1] == ' ' and rows[y][x + 1] == ' ') or
+              (rows[y - 1][x] == ' ' and rows[y + 1][x] == ' '))]
+    for x, y in rng.sample(walls, int(loops * len(walls))):
+        rows[y][x] = ' '
+
+    free = [(x, y) for y in range(height) for x in range(width)
+            if rows[y][x] == ' ']
+    if len(free) < ghosts + capsules + 2:
+        raise Exception("The maze is too small for its agents and capsules")
+    rng.shuffle(free)
+    pacman = free.pop()
+    rows[pacman[1]][pacman[0]] = 'P'
+
+    # Ghosts start as far as possible from Pacman
+    free.sort(key=lambda pos: manhattanDistance(pos, pacman))
+    for _ in range(ghosts):
+        x, y = free.pop(rng.randrange(len(free) // 2, len(free)))
+        rows[y][x] = 'G'
+    rng.shuffle(free)
+    for _ in range(capsules):
+        x, y = free.pop()
+        rows[y][x] = 'o'
+    for i, (x, y) in enumerate(free):
+        if i == 0 or rng.random() < food:
+            rows[y][x] = '.'
+    return Layout([''.join(row) for row in rows])
+
+
+def padBorders(layout, thickness):
+    """
+    Returns `layout` with borders `thickness` walls thick.
+
+    The layout is padded from its stripped text (see Layout.layoutText),
+    so its borders are closed even where the lines of its file end with
+    whitespace.
+    """
+    if thickness <= 1:
+        return layout
+    pad = '%' * (thickness - 1)
+    wall = '%' * (layout.width + 2 * len(pad))
+    return Layout([wall] * len(pad) +
+                  [pad + line + pad for line in layout.layoutText] +
+                  [wall] * len(pad))
+
+
+def tileLayout(layout, columns, rows):
+    """
+    Returns `columns` x `rows` copies of `layout` side by side, sharing
+    their borders. The borders are opened wherever corridors meet on both
+    sides. The agents of the layout are only kept in the first copy (top
+    left), so the tiled layout has the same agents.
+    """
+    text = layout.layoutText
+    empty = [''.join(' ' if c in _AGENTS else c for c in line)
+             for line in text]
+    lines = []
+    for j in range(rows):
+        tileRows = range(len(text)) if j == 0 else range(1, len(text))
+        for y in tileRows:
+            line = text[y] if j == 0 else empty[y]
+            for i in range(1, columns):
+                line = line + empty[y][1:]
+            lines.append(line)
+    grid = [list(line) for line in lines]
+
+    # Open the shared borders between corridors
+    step = layout.width - 1
+    for x in range(step, step * columns, step):
+        for y in range(1, len(grid) - 1):
+            if grid[y][x - 1] != '%' and grid[y][x + 1] != '%':
+                grid[y][x] = ' '
+    step = layout.height - 1
+    for y in range(step, step * rows, step):
+        for x in range(1, len(grid[0]) - 1):
+            if grid[y - 1][x] != '%' and grid[y + 1][x] != '%':
+                grid[y][x] = ' '
+    return Layout([''.join(line) for line in grid])
+
+
+def mirrorLayout(layout, horizontal=True):
+    """
+    Returns `layout` mirrored left to right (or top to bottom if not
+    `horizontal`).
+    """
+    if horizontal:
+        return Layout([line[::-1] for line in layout.layoutText])
+    return Layout(layout.layoutText[::-1])
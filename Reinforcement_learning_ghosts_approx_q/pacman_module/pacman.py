@@ -43,10 +43,14 @@ from .game import GameStateData
 from .game import Game
 from .game import Directions
 from .game import Actions
+from .game import Configuration
+from .game import Agent
+from .recording import GameArchive, GameRecorder
 from .util import nearestPoint
 from .util import manhattanDistance
 from . import textDisplay, graphicsDisplay
 from . import util, layout
+import collections
 import sys
 import types
 import time
@@ -58,6 +62,15 @@ import numpy as np
 # YOUR INTERFACE TO THE PACMAN WORLD: A GameState #
 ###################################################
 
+def checkDeadline(context):
+    """
+    Raises DeadlineExceededException if the move deadline of `context` has
+    passed.
+    """
+    if time.monotonic() >= context.deadline:
+        raise util.DeadlineExceededException()
+
+
 class GameState:
     """
     A GameState specifies the full game state, including the food, capsules,
@@ -72,35 +85,42 @@ class GameState:
 
     Note that in classic Pacman, Pacman is always agent 0.
     """
+    __slots__ = ('data',)
 
     ####################################################
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions
-    explored = set()
-    # static variable keeps track of number of calls of
-    # /!\ XXX: Do NOT modify this variable during get_action call.
+    # Node expansion accounting lives in the ExpansionContext of the game
+    # (in game.py), shared by all the states of the game.
+    # /!\ XXX: Do NOT modify the counter during get_action call.
     # /!\ Otherwise, your project won't be graded
-    countExpanded=0
-    maximumExpanded = np.inf
-    def resetNodeExpansionCounter():
-        GameState.countExpanded=0
+    def getExpansionContext(self):
+        return self.data.context
 
-    def setMaximumExpanded(m):
-        GameState.maximumExpanded = m
+    def resetNodeExpansionCounter(self):
+        self.data.context.resetNodeExpansionCounter()
 
-    def getAndResetExplored():
-        tmp = GameState.explored.copy()
-        GameState.explored = set()
-        return tmp
-    getAndResetExplored = staticmethod(getAndResetExplored)
+    def setMaximumExpanded(self, m):
+        self.data.context.setMaximumExpanded(m)
+
+    def setExploredTracking(self, mode, size=1000):
+        self.data.context.setExploredTracking(mode, size)
+
+    def getAndResetExplored(self):
+        return self.data.context.getAndResetExplored()
+
+    def getDeadline(self):
+        """
+        Returns the time.monotonic() value by which the agent to move must
+        have moved, or None if it has no deadline.
+        """
+        return self.data.context.deadline
 
     def getLegalActions(self, agentIndex=0):
         """
         Returns the legal actions for the agent specified.
         """
-#        GameState.explored.add(self)
         if self.isWin() or self.isLose():
             return []
 
@@ -116,32 +136,91 @@ class GameState:
         # Check that successors exist
         if self.isWin() or self.isLose():
             raise Exception('Can\'t generate a successor of a terminal state.')
+        if self.data.context.deadline is not None:
+            checkDeadline(self.data.context)
 
         # Copy current state
         state = GameState(self)
+        state.applyRules(agentIndex, action)
+        track = self.data.context.track
+        if track is not None:
+            track(self, state)
+        return state
+
+    def apply(self, agentIndex, action):
+        """
+        Applies the action of the specified agent to this state in place,
+        instead of allocating a successor state.
 
+        Returns an undo token; passing it to `undo` restores the state
+        exactly, score and win/lose flags included. Tokens must be undone
+        in reverse order, as in a depth-first search.
+        """
+        if self.isWin() or self.isLose():
+            raise Exception('Can\'t apply an action to a terminal state.')
+        if self.data.context.deadline is not None:
+            checkDeadline(self.data.context)
+
+        data = self.data
+        token = (data.food, data.capsules, data._eaten, data.score,
+                 data.scoreChange, data._hash, data._agentMoved,
+                 data._foodEaten, data._foodAdded, data._capsuleEaten,
+                 [(agentState.configuration, agentState.scaredTimer)
+                  for agentState in data.agentStates])
+
+        # Same starting point as a fresh GameStateData copy
+        data._foodEaten = None
+        data._foodAdded = None
+        data._capsuleEaten = None
+        data._agentMoved = None
+        data.scoreChange = 0
+        self.applyRules(agentIndex, action)
+        return token
+
+    def undo(self, token):
+        """
+        Reverts the action applied by the `apply` call that returned `token`.
+        """
+        data = self.data
+        (data.food, data.capsules, data._eaten, data.score,
+         data.scoreChange, data._hash, data._agentMoved,
+         data._foodEaten, data._foodAdded, data._capsuleEaten,
+         agents) = token
+        for agentState, (configuration, scaredTimer) in zip(
+                data.agentStates, agents):
+            agentState.configuration = configuration
+            agentState.scaredTimer = scaredTimer
+        # Actions are never applied to terminal states
+        data._win = False
+        data._lose = False
+
+    def applyRules(self, agentIndex, action):
+        """
+        Edits the state to reflect the agent's action and its consequences.
+        The rules never mutate the food grid, the capsule list or the
+        `_eaten` list in place, so `apply` can restore them by reference.
+        """
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
-            state.data._eaten = [False for i in range(state.getNumAgents())]
-            PacmanRules.applyAction(state, action)
+            self.data._eaten = [False for i in range(self.getNumAgents())]
+            PacmanRules.applyAction(self, action)
         else:                # A ghost is moving
-            GhostRules.applyAction(state, action, agentIndex)
+            GhostRules.applyAction(self, action, agentIndex)
 
         # Time passes
         if agentIndex == 0:
-            state.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
+            self.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
         else:
-            GhostRules.decrementTimer(state.data.agentStates[agentIndex])
+            self.data.hashAgent(agentIndex)
+            GhostRules.decrementTimer(self.data.agentStates[agentIndex])
+            self.data.hashAgent(agentIndex)
 
         # Resolve multi-agent effects
-        GhostRules.checkDeath(state, agentIndex)
+        GhostRules.checkDeath(self, agentIndex)
 
         # Book keeping
-        state.data._agentMoved = agentIndex
-        state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
-        return state
+        self.data._agentMoved = agentIndex
+        self.data.score += self.data.scoreChange
 
     def getLegalPacmanActions(self):
         return self.getLegalActions(0)
@@ -156,22 +235,133 @@ class GameState:
         """
         Returns a list of pairs of successor states and moves given the current state s for the pacman agent.
         """
-        if (GameState.countExpanded >= GameState.maximumExpanded):
+        context = self.data.context
+        if (context.countExpanded >= context.maximumExpanded):
             return None
-        GameState.countExpanded += 1
+        context.countExpanded += 1
+        if context.deadline is not None:
+            checkDeadline(context)
         return [(self.generateSuccessor(0, action),action) for action in self.getLegalPacmanActions() if action != Directions.STOP]
 
+    def generatePacmanMacroSuccessors(self):
+        """
+        Returns a list of pairs of successor states and lists of moves, one
+        per macro-action of pacman: following the corridor he is in (or
+        each corridor leaving the junction he is on) to the next junction
+        or dead end, while the ghosts stand still (see
+        junctions.JunctionGraph). A macro-action stops where the game ends,
+        if it ends on the way.
+
+        Expanding a state charges one node expansion, whatever the length
+        of its corridors.
+        """
+        context = self.data.context
+        if (context.countExpanded >= context.maximumExpanded):
+            return None
+        context.countExpanded += 1
+        if context.deadline is not None:
+            checkDeadline(context)
+
+        junctions = self.data.layout.getJunctions()
+        successors = []
+        for edge in junctions.getMacroActions(self.getPacmanPosition()):
+            state = GameState(self)
+            data = state.data
+            scoreChange = 0
+            for i, action in enumerate(edge.actions):
+                if i > 0:
+                    # Same starting point as a fresh GameStateData copy
+                    data._foodEaten = None
+                    data._foodAdded = None
+                    data._capsuleEaten = None
+                    data.scoreChange = 0
+                state.applyRules(0, action)
+                scoreChange += data.scoreChange
+                if data._win or data._lose:
+                    break
+            data.scoreChange = scoreChange
+            if context.track is not None:
+                context.track(self, state)
+            successors.append((state, list(edge.actions[:i + 1])))
+        return successors
+
     def generateGhostSuccessors(self,index):
         """
          Returns a list of pairs of successor states and moves given the current state s for the ghost agent (>0).
         """
 
-        if (GameState.countExpanded >= GameState.maximumExpanded or index == 0):
+        context = self.data.context
+        if (context.countExpanded >= context.maximumExpanded or index == 0):
             return None
-        GameState.countExpanded += 1
+        context.countExpanded += 1
+        if context.deadline is not None:
+            checkDeadline(context)
 
         return [(self.generateSuccessor(index, action),action) for action in self.getLegalActions(index) if action != Directions.STOP]
 
+    def iterPacmanSuccessors(self, order=None):
+        """
+        Lazy counterpart of generatePacmanSuccessors: yields (action,
+        successor) pairs one at a time, so that a search which prunes after
+        the first children does not build the others.
+
+        See iterSuccessors for the meaning of `order`.
+        """
+        return self.iterSuccessors(0, order)
+
+    def iterGhostSuccessors(self, index, order=None):
+        """
+        Lazy counterpart of generateGhostSuccessors for the ghost agent (>0).
+
+        See iterSuccessors for the meaning of `order`.
+        """
+        if index == 0:
+            raise Exception("Pacman's index passed to iterGhostSuccessors")
+        return self.iterSuccessors(index, order)
+
+    def iterSuccessors(self, agentIndex, order=None):
+        """
+        Yields (action, successor) pairs for the legal moves (except STOP)
+        of the specified agent, building each successor only when asked for.
+
+        Each successor charges one node expansion when it is built, and the
+        generator stops once the expansion budget is exhausted.
+
+        If `order` is a sequence of actions, legal actions are yielded in
+        that order first, then the remaining legal actions in their usual
+        order.
+        """
+        actions = [action for action in self.getLegalActions(agentIndex)
+                   if action != Directions.STOP]
+        if order is not None:
+            rank = dict((action, i) for i, action in enumerate(order))
+            actions.sort(key=lambda action: rank.get(action, len(rank)))
+        context = self.data.context
+        for action in actions:
+            if context.countExpanded >= context.maximumExpanded:
+                return
+            context.countExpanded += 1
+            if context.deadline is not None:
+                checkDeadline(context)
+            yield action, self.generateSuccessor(agentIndex, action)
+
+    def expand(self, agentIndex):
+        """
+        Returns the actions leading to the successors of the current state
+        for the specified agent, to be played with `apply`/`undo`.
+
+        This is the in-place counterpart of generatePacmanSuccessors and
+        generateGhostSuccessors: it charges one node expansion and returns
+        None once the expansion budget is exhausted.
+        """
+        context = self.data.context
+        if (context.countExpanded >= context.maximumExpanded):
+            return None
+        context.countExpanded += 1
+        if context.deadline is not None:
+            checkDeadline(context)
+        return [action for action in self.getLegalActions(agentIndex) if action != Directions.STOP]
+
     def getPacmanState(self):
         """
         Returns an AgentState object for pacman (in game.py)
@@ -197,6 +387,18 @@ class GameState:
             raise Exception("Pacman's index passed to getGhostPosition")
         return self.data.agentStates[agentIndex].getPosition()
 
+    def getVisibleGhosts(self):
+        """
+        Returns the states of the ghosts Pacman sees, in a straight line
+        ahead of him up to the first wall.
+        """
+        pacman = self.data.agentStates[0]
+        layout = self.data.layout
+        return [ghost for ghost in self.getGhostStates()
+                if layout.isVisibleFrom(ghost.getPosition(),
+                                        pacman.getPosition(),
+                                        pacman.getDirection())]
+
     def getGhostPositions(self):
         return [tuple(map(int,s.getPosition())) for s in self.getGhostStates()]
 
@@ -265,8 +467,18 @@ class GameState:
         else:
             self.data = GameStateData()
 
+    def snapshot(self):
+        """
+        Returns a cheap copy-on-write copy of the state, used as the
+        observation handed to agents. It shares the layout and the food
+        grid with this state until one of them is written to.
+        """
+        state = GameState()
+        state.data = self.data.snapshot()
+        return state
+
     def deepCopy(self):
-        state = GameState(self)
+        state = GameState()
         state.data = self.data.deepCopy()
         return state
 
@@ -304,14 +516,51 @@ COLLISION_TOLERANCE = 0.7  # How close ghosts must be to Pacman to kill
 TIME_PENALTY = 1  # Number of points lost each round
 
 
+class StallDetector:
+    """
+    Spots a game going round in circles: the game is stalled once the same
+    Pacman position, food and ghost positions come up `repeats` times
+    within the last `window` Pacman moves.
+    """
+    STALL_REPEATS = 3
+
+    def __init__(self, window, repeats=STALL_REPEATS):
+        self.repeats = repeats
+        self.keys = collections.deque(maxlen=window)
+        self.counts = collections.Counter()
+
+    def update(self, state):
+        """
+        Adds the state reached by a Pacman move and returns whether the game
+        is stalled.
+        """
+        data = state.data
+        key = (data.agentStates[0].getPosition(), data.food.bits,
+               tuple(agentState.getPosition()
+                     for agentState in data.agentStates[1:]))
+        if len(self.keys) == self.keys.maxlen:
+            self.counts[self.keys[0]] -= 1
+        self.keys.append(key)
+        self.counts[key] += 1
+        return self.counts[key] >= self.repeats
+
+
 class ClassicGameRules:
     """
     These game rules manage the control flow of a game, deciding when
     and how the game starts and ends.
+
+    Games are truncated, neither won nor lost, after `maxMoves` moves (of
+    all agents) or once they stall (see StallDetector) over a window of
+    `stallWindow` Pacman moves; None disables either limit.
     """
 
-    def __init__(self, timeout=30):
+    def __init__(self, timeout=30, moveTime=None, maxMoves=None,
+                 stallWindow=None):
         self.timeout = timeout
+        self.moveTime = moveTime
+        self.maxMoves = maxMoves
+        self.stallWindow = stallWindow
 
     def newGame(
             self,
@@ -320,13 +569,20 @@ class ClassicGameRules:
             ghostAgents,
             display,
             quiet=False,
-            catchExceptions=False):
+            catchExceptions=False,
+            deepCopyObservations=False,
+            trackExplored=None,
+            rng=None):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize(layout, len(ghostAgents))
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        initState.setExploredTracking(trackExplored)
+        game = Game(agents, display, self, catchExceptions=catchExceptions,
+                    deepCopyObservations=deepCopyObservations, rng=rng)
         game.state = initState
-        self.initialState = initState.deepCopy()
+        if self.stallWindow is not None:
+            game.stallDetector = StallDetector(self.stallWindow)
+        self.initialState = initState.snapshot()
         self.quiet = quiet
         return game
 
@@ -338,6 +594,15 @@ class ClassicGameRules:
             self.win(state, game)
         if state.isLose():
             self.lose(state, game)
+        if game.gameOver:
+            return
+        if self.maxMoves is not None and \
+                len(game.moveHistory) >= self.maxMoves:
+            self.truncate(state, game, Game.TRUNCATED_MOVES)
+        elif game.stallDetector is not None and \
+                state.data._agentMoved == 0 and \
+                game.stallDetector.update(state):
+            self.truncate(state, game, Game.TRUNCATED_STALL)
 
     def win(self, state, game):
         if not self.quiet:
@@ -349,6 +614,13 @@ class ClassicGameRules:
             print("Pacman died! Score: %d" % state.data.score)
         game.gameOver = True
 
+    def truncate(self, state, game, reason):
+        if not self.quiet:
+            print("Game truncated (%s)! Score: %d" %
+                  (reason, state.data.score))
+        game.truncated = reason
+        game.gameOver = True
+
     def getProgress(self, game):
         return float(game.state.getNumFood()) / self.initialState.getNumFood()
 
@@ -370,6 +642,13 @@ class ClassicGameRules:
     def getMoveTimeout(self, agentIndex):
         return self.timeout
 
+    def getMoveTime(self, agentIndex):
+        """
+        Returns the wall-clock time in seconds each move of the agent must
+        be made in, or None for no deadline.
+        """
+        return self.moveTime
+
     def getMaxTimeWarnings(self, agentIndex):
         return 0
 
@@ -385,25 +664,26 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions(
-            state.getPacmanState().configuration,
-            state.data.layout.walls)
+        return list(state.data.layout.getMoveTable().getPossibleActions(
+            state.data.agentStates[0].configuration))
     getLegalActions = staticmethod(getLegalActions)
 
     def applyAction(state, action):
         """
         Edits the state to reflect the results of the action.
         """
-        legal = PacmanRules.getLegalActions(state)
+        pacmanState = state.data.agentStates[0]
+        legal = state.data.layout.getMoveTable().getPossibleActions(
+            pacmanState.configuration)
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
-
         # Update Configuration
         vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
+        state.data.hashAgent(0)
         pacmanState.configuration = pacmanState.configuration.generateSuccessor(
             vector)
+        state.data.hashAgent(0)
 
         # Eat
         next = pacmanState.configuration.getPosition()
@@ -420,6 +700,7 @@ class PacmanRules:
             state.data.scoreChange += 10
             state.data.food = state.data.food.copy()
             state.data.food[x][y] = False
+            state.data.hashFood(position)
             state.data._foodEaten = position
             # TODO: cache numFood?
             numFood = state.getNumFood()
@@ -428,11 +709,15 @@ class PacmanRules:
                 state.data._win = True
         # Eat capsule
         if(position in state.getCapsules()):
-            state.data.capsules.remove(position)
+            state.data.capsules = [capsule for capsule in state.data.capsules
+                                   if capsule != position]
+            state.data.hashCapsule(position)
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range(1, len(state.data.agentStates)):
+                state.data.hashAgent(index)
                 state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.hashAgent(index)
     consume = staticmethod(consume)
 
 
@@ -448,36 +733,35 @@ class GhostRules:
         reach a dead end, but can turn 90 degrees at intersections.
         """
         conf = state.getGhostState(ghostIndex).configuration
-        possibleActions = Actions.getPossibleActions(
-            conf, state.data.layout.walls)
-        reverse = Actions.reverseDirection(conf.direction)
-        if Directions.STOP in possibleActions:
-            possibleActions.remove(Directions.STOP)
-        if reverse in possibleActions and len(possibleActions) > 1:
-            possibleActions.remove(reverse)
-        return possibleActions
+        return list(state.data.layout.getMoveTable().getGhostActions(conf))
     getLegalActions = staticmethod(getLegalActions)
 
     def applyAction(state, action, ghostIndex):
 
-        legal = GhostRules.getLegalActions(state, ghostIndex)
+        ghostState = state.data.agentStates[ghostIndex]
+        legal = state.data.layout.getMoveTable().getGhostActions(
+            ghostState.configuration)
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0:
             speed /= 2.0
         vector = Actions.directionToVector(action, speed)
+        state.data.hashAgent(ghostIndex)
         ghostState.configuration = ghostState.configuration.generateSuccessor(
             vector)
+        state.data.hashAgent(ghostIndex)
     applyAction = staticmethod(applyAction)
 
     def decrementTimer(ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint(
-                ghostState.configuration.pos)
+            # Configurations are shared between successive states, so snap
+            # to the grid with a new one rather than editing it in place
+            ghostState.configuration = Configuration(
+                nearestPoint(ghostState.configuration.pos),
+                ghostState.configuration.direction)
         ghostState.scaredTimer = max(0, timer - 1)
     decrementTimer = staticmethod(decrementTimer)
 
@@ -499,9 +783,12 @@ class GhostRules:
     def collide(state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
             state.data.scoreChange += 200
+            state.data.hashAgent(agentIndex)
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
+            state.data.hashAgent(agentIndex)
             # Added for first-person
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -626,12 +913,12 @@ def readCommand(argv):
         '--recordActions',
         action='store_true',
         dest='record',
-        help='Writes game histories to a file (named by the time they were played)',
+        help='Appends game histories to a recording file (named by the time they were played)',
         default=False)
     parser.add_option(
         '--replay',
         dest='gameToReplay',
-        help='A recorded game file (pickle) to replay',
+        help='A recording file to replay (with the layout it was played on)',
         default=None)
     parser.add_option(
         '-a',
@@ -720,15 +1007,15 @@ def readCommand(argv):
     # Special case: recorded games don't use the runGames method or args
     # structure
     if options.gameToReplay is not None:
-        print('Replaying recorded game %s.' % options.gameToReplay)
-        import pickle
-        f = open(options.gameToReplay)
+        print('Replaying recorded games %s.' % options.gameToReplay)
+        archive = GameArchive(options.gameToReplay)
         try:
-            recorded = pickle.load(f)
+            for i in range(len(archive)):
+                replay = archive.getReplay(i, args['layout'])
+                replayGame(args['layout'], replay.getMoves(),
+                           args['display'], replay.numAgents)
         finally:
-            f.close()
-        recorded['display'] = args['display']
-        replayGame(**recorded)
+            archive.close()
         sys.exit(0)
 
     return args
@@ -764,12 +1051,12 @@ def loadAgent(pacman, nographics):
         ' is not specified in any *Agents.py.')
 
 
-def replayGame(layout, actions, display):
-    import pacmanAgents
-    import ghostAgents
+def replayGame(layout, actions, display, numAgents=None):
+    if numAgents is None:
+        numAgents = layout.getNumGhosts() + 1
     rules = ClassicGameRules()
-    agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i + 1)
-                                             for i in range(layout.getNumGhosts())]
+    # The agents only stand in for the players of the recorded moves
+    agents = [Agent(i) for i in range(numAgents)]
     game = rules.newGame(layout, agents[0], agents[1:], display)
     state = game.state
     display.initialize(state.data)
@@ -785,6 +1072,247 @@ def replayGame(layout, actions, display):
     display.finish()
 
 
+def gameSeeds(seed, numGames):
+    """
+    Derives one independent seed per game from the master `seed`, so that
+    game i is played with the same seed however games are scheduled.
+    """
+    return [int(child.generate_state(1)[0])
+            for child in np.random.SeedSequence(seed).spawn(numGames)]
+
+
+def seedGame(seed):
+    """
+    Returns the random number generator of a game played with `seed`, handed
+    to its agents. Its stream is derived from `seed` on its own, and the
+    global generators are left untouched.
+    """
+    child, = np.random.SeedSequence(seed).spawn(1)
+    return random.Random(int(child.generate_state(1, np.uint64)[0]))
+
+
+# State of a warm pool worker, set once by _initWorker
+_worker = {}
+
+
+def _initWorker(layout, agents, rules, catchExceptions, turbo):
+    _worker['layout'] = layout
+    _worker['agents'] = agents
+    _worker['rules'] = rules
+    _worker['catchExceptions'] = catchExceptions
+    _worker['turbo'] = turbo
+
+
+def _runWorkerGame(seed):
+    """
+    Plays one game in a pool worker, with fresh copies of the agents, and
+    returns its final state (without the layout), move history, agent
+    times, number of expanded nodes and truncation.
+    """
+    import pickle
+    pacman, ghosts = pickle.loads(_worker['agents'])
+    rng = seedGame(seed)
+    game = _worker['rules'].newGame(
+        _worker['layout'], pacman, ghosts, textDisplay.NullGraphics(),
+        True, _worker['catchExceptions'], rng=rng)
+    if _worker['turbo']:
+        game.runTurbo()
+    else:
+        game.run()
+    game.state.data.layout = None
+    return (game.state, game.moveHistory, game.totalAgentTimes,
+            game.totalExpandedNodes, game.truncated)
+
+
+class GameResult:
+    """
+    A compact record of a finished game, as yielded by iterGames: its
+    index and seed, final score and outcome, number of moves (plies), the
+    computation time of each agent and the number of nodes expanded.
+    `truncated` is why the rules cut the game short (see Game.truncated).
+    """
+    __slots__ = ('index', 'seed', 'score', 'win', 'lose', 'truncated',
+                 'moves', 'computeTimes', 'expandedNodes')
+
+    def __init__(self, index, seed, game):
+        self.index = index
+        self.seed = seed
+        self.score = game.state.getScore()
+        self.win = game.state.isWin()
+        self.lose = game.state.isLose()
+        self.truncated = game.truncated
+        self.moves = len(game.moveHistory)
+        self.computeTimes = list(game.totalAgentTimes)
+        self.expandedNodes = game.totalExpandedNodes
+
+    def __repr__(self):
+        return ('GameResult(index=%d, seed=%s, score=%s, win=%s, '
+                'truncated=%s, moves=%d, expandedNodes=%d)' %
+                (self.index, self.seed, self.score, self.win,
+                 self.truncated, self.moves, self.expandedNodes))
+
+
+def _playGames(
+        layout,
+        pacman,
+        ghosts,
+        display,
+        numGames,
+        numTraining=0,
+        catchExceptions=False,
+        timeout=30,
+        workers=None,
+        seed=None,
+        turbo=False,
+        recorder=None,
+        moveTime=None,
+        maxMoves=None,
+        stallWindow=None):
+    """
+    Plays the games of runGames and iterGames (see runGames for the
+    arguments) and yields (index, seed, game) for every game as soon as it
+    is over, training games included. The seed is None for serial games
+    without a master seed. Games are appended to `recorder` if given.
+
+    Agents with a `close` method, such as remote agents and their worker
+    processes, are closed once the games are over.
+    """
+    try:
+        rules = ClassicGameRules(timeout, moveTime, maxMoves, stallWindow)
+
+        if workers is None:
+            if seed is None:
+                seeds = [None] * numGames
+            else:
+                seeds = gameSeeds(seed, numGames)
+            for i in range(numGames):
+                if not turbo:
+                    print('Game number: ', i)
+                beQuiet = i < numTraining or turbo
+                if beQuiet:
+                        # Suppress output and graphics
+                    gameDisplay = textDisplay.NullGraphics()
+                    rules.quiet = True
+                else:
+                    gameDisplay = display
+                    rules.quiet = False
+                rng = None
+                if seeds[i] is not None:
+                    rng = seedGame(seeds[i])
+                game = rules.newGame(
+                    layout,
+                    pacman,
+                    ghosts,
+                    gameDisplay,
+                    beQuiet,
+                    catchExceptions,
+                    rng=rng)
+                if recorder is not None:
+                    game.recorder = recorder
+                    recorder.startGame(layout, len(game.agents), seeds[i])
+                if turbo:
+                    game.runTurbo()
+                else:
+                    game.run()
+                if recorder is not None:
+                    recorder.endGame()
+                yield i, seeds[i], game
+        else:
+            import multiprocessing
+            import pickle
+            for agent in [pacman] + list(ghosts):
+                if getattr(agent, 'learns', False):
+                    raise Exception(
+                        "%s learns while it plays: its games cannot be spread "
+                        "over workers" % type(agent).__name__)
+            if seed is None:
+                seed = random.getrandbits(32)
+            seeds = gameSeeds(seed, numGames)
+
+            for i in range(numTraining):
+                if not turbo:
+                    print('Game number: ', i)
+                rng = seedGame(seeds[i])
+                game = rules.newGame(layout, pacman, ghosts,
+                                     textDisplay.NullGraphics(), True,
+                                     catchExceptions, rng=rng)
+                if recorder is not None:
+                    game.recorder = recorder
+                    recorder.startGame(layout, len(game.agents), seeds[i])
+                if turbo:
+                    game.runTurbo()
+                else:
+                    game.run()
+                if recorder is not None:
+                    recorder.endGame()
+                yield i, seeds[i], game
+
+            agents = pickle.dumps((pacman, ghosts))
+            chunksize = max(1, (numGames - numTraining) // (4 * workers))
+            with multiprocessing.Pool(
+                    workers, _initWorker,
+                    (layout, agents, rules, catchExceptions, turbo)) as pool:
+                results = pool.imap(_runWorkerGame, seeds[numTraining:],
+                                    chunksize)
+                for i, result in enumerate(results, numTraining):
+                    (state, moveHistory, agentTimes, expandedNodes,
+                     truncated) = result
+                    if not turbo:
+                        print('Game number: ', i)
+                    state.data.layout = layout
+                    game = rules.newGame(layout, pacman, ghosts, display,
+                                         turbo, catchExceptions)
+                    game.state = state
+                    game.moveHistory = moveHistory
+                    game.totalAgentTimes = agentTimes
+                    game.totalExpandedNodes = expandedNodes
+                    if truncated is not None:
+                        rules.truncate(state, game, truncated)
+                    else:
+                        rules.process(state, game)
+                    if recorder is not None:
+                        recorder.recordGame(layout, len(game.agents),
+                                            moveHistory, seeds[i])
+                    yield i, seeds[i], game
+
+    finally:
+        for agent in [pacman] + list(ghosts):
+            close = getattr(agent, 'close', None)
+            if close is not None:
+                close()
+
+def iterGames(
+        layout,
+        pacman,
+        ghosts,
+        display,
+        numGames,
+        numTraining=0,
+        catchExceptions=False,
+        timeout=30,
+        workers=None,
+        seed=None,
+        turbo=False,
+        moveTime=None,
+        maxMoves=None,
+        stallWindow=None):
+    """
+    Streaming counterpart of runGames: yields a GameResult for each
+    non-training game as soon as it is over, and keeps no reference to the
+    games, so that callers can aggregate results in constant memory.
+    """
+    import __main__
+    __main__.__dict__['_display'] = display
+
+    for i, gameSeed, game in _playGames(layout, pacman, ghosts, display,
+                                       numGames, numTraining,
+                                       catchExceptions, timeout, workers,
+                                       seed, turbo, None, moveTime,
+                                       maxMoves, stallWindow):
+        if i >= numTraining:
+            yield GameResult(i, gameSeed, game)
+
+
 def runGames(
         layout,
         pacman,
@@ -794,44 +1322,67 @@ def runGames(
         record,
         numTraining=0,
         catchExceptions=False,
-        timeout=30):
+        timeout=30,
+        workers=None,
+        seed=None,
+        turbo=False,
+        moveTime=None,
+        maxMoves=None,
+        stallWindow=None):
+    """
+    Plays `numGames` games, the first `numTraining` of them quietly, and
+    returns the other games.
+
+    If `moveTime` is set, every move must be made within `moveTime`
+    seconds of wall-clock time (see ClassicGameRules.getMoveTime).
+
+    Games are truncated after `maxMoves` moves, or once they stall over a
+    window of `stallWindow` Pacman moves (see ClassicGameRules).
+
+    If `record` is True, or the path of a recording file, all the games are
+    appended to that file (see recording.py); by default the file is named
+    by the time the games were played.
+
+    If `turbo` is True, games are played with Game.runTurbo: same games,
+    without graphics or per-game messages.
+
+    By default games are played one after the other. If `workers` is set,
+    the training games are still played in this process, but the other
+    games are spread over a pool of `workers` processes, each loading the
+    layout and agents once. Every game is then seeded with its own seed
+    derived from `seed` (drawn from `random` if None) and every evaluation
+    game starts from a copy of the agents as they are after training, so
+    that results do not depend on the number of workers. Evaluation games
+    are played without graphics. Serial games are seeded the same way
+    when `seed` is given.
+
+    The copies are thrown away after their game, so pooled evaluation
+    freezes the agents: it only plays the same games as serial evaluation
+    for agents that do not change as they play. Agents that learn while
+    they play (see Agent.learns) are refused.
+    """
     import __main__
     __main__.__dict__['_display'] = display
 
-    rules = ClassicGameRules(timeout)
-    games = []
+    recorder = None
+    if record:
+        if record is True:
+            record = 'recorded-games-' + \
+                '-'.join([str(t) for t in time.localtime()[1:6]]) + '.pcr'
+        recorder = GameRecorder(record)
 
-    for i in range(numGames):
-        print('Game number: ', i)
-        beQuiet = i < numTraining
-        if beQuiet:
-                # Suppress output and graphics
-            from . import textDisplay
-            gameDisplay = textDisplay.NullGraphics()
-            rules.quiet = True
-        else:
-            gameDisplay = display
-            rules.quiet = False
-        game = rules.newGame(
-            layout,
-            pacman,
-            ghosts,
-            gameDisplay,
-            beQuiet,
-            catchExceptions)
-        game.run()
-        if not beQuiet:
-            games.append(game)
-
-        if record:
-            import time
-            import pickle
-            fname = ('recorded-game-%d' % (i + 1)) + \
-                '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
+    games = []
+    try:
+        for i, _, game in _playGames(layout, pacman, ghosts, display,
+                                     numGames, numTraining, catchExceptions,
+                                     timeout, workers, seed, turbo,
+                                     recorder, moveTime, maxMoves,
+                                     stallWindow):
+            if i >= numTraining:
+                games.append(game)
+    finally:
+        if recorder is not None:
+            recorder.close()
 
     if (numGames - numTraining) > 0:
         scores = [game.state.getScore() for game in games]
@@ -842,7 +1393,8 @@ def runGames(
         print('Win Rate:      %d/%d (%.2f)' %
               (wins.count(True), len(wins), winRate))
         print('Record:       ', ', '.join(
-            [['Loss', 'Win'][int(w)] for w in wins]))
+            ['Truncated' if game.truncated is not None else
+             ['Loss', 'Win'][int(game.state.isWin())] for game in games]))
 
     return games
 
@@ -852,13 +1404,34 @@ def runGame(
         pacman,
         ghosts,
         displayGraphics,
-        expout=np.inf):
+        expout=np.inf,
+        turbo=False,
+        seed=None,
+        moveTime=None,
+        maxMoves=None,
+        stallWindow=None):
+    """
+    Plays one game and returns its score, computation time and number of
+    expanded nodes. If `turbo` is True, the game is played headless with
+    Game.runTurbo (and a computation time of 0). If `seed` is given, the
+    game is played with its own random number generator (see seedGame),
+    e.g. to replay game i of a batch from GameResult.seed. If `moveTime`
+    is set, every move must be made within `moveTime` seconds. The game is
+    truncated after `maxMoves` moves or once it stalls over `stallWindow`
+    Pacman moves.
+    """
     display = graphicsDisplay.PacmanGraphics(
-        1.0, frameTime=0.1) if displayGraphics else textDisplay.NullGraphics()
+        1.0, frameTime=0.1) if displayGraphics and not turbo \
+        else textDisplay.NullGraphics()
     import __main__
     __main__.__dict__['_display'] = display
     lay = layout.getLayout(layout_name)
 
-    rules = ClassicGameRules(expout)
-    game = rules.newGame(lay, pacman, ghosts, display, False, False)
+    rules = ClassicGameRules(expout, moveTime, maxMoves, stallWindow)
+    rng = None
+    if seed is not None:
+        rng = seedGame(seed)
+    game = rules.newGame(lay, pacman, ghosts, display, turbo, False, rng=rng)
+    if turbo:
+        return game.runTurbo()
     return game.run()
@@ -0,0 +1,175 @@
+# recording.py
+# ------------
+# Compact binary recordings of Pacman games, and their replay.
+
+"""
+A recording file is an archive of games, appended one after the other.
+Each game is stored as:
+
+  - a header: magic number, fingerprint of the layout (see
+    Layout.getFingerprint), seed of the game (-1 if unknown) and number of
+    agents;
+  - the moves of the game, one byte per move, in the order they were
+    played (agents play in turn, starting with Pacman);
+  - an end-of-game byte.
+
+Moves are written while the game runs, through a buffered file, so that
+recording costs one small write per move. GameArchive memory-maps a
+recording file and GameReplay rebuilds the state of a game after any
+number of moves, starting from the nearest of the states it checkpoints
+every `checkpointInterval` moves.
+"""
+
+import mmap
+import struct
+
+from .game import Directions
+
+MAGIC = b'PCR1'
+HEADER = struct.Struct('<4s16sqB')
+END_OF_GAME = 0xff
+
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST,
+           Directions.WEST, Directions.STOP]
+_ACTION_BYTES = dict((action, bytes([code]))
+                     for code, action in enumerate(ACTIONS))
+
+
+class GameRecorder:
+    """
+    Appends games to a recording file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+
+    def startGame(self, layout, numAgents, seed=None):
+        self.file.write(HEADER.pack(MAGIC, layout.getFingerprint(),
+                                    -1 if seed is None else seed,
+                                    numAgents))
+
+    def recordMove(self, action):
+        self.file.write(_ACTION_BYTES[action])
+
+    def endGame(self):
+        self.file.write(bytes([END_OF_GAME]))
+
+    def recordGame(self, layout, numAgents, moveHistory, seed=None):
+        """
+        Records a whole game at once, from its move history.
+        """
+        self.startGame(layout, numAgents, seed)
+        self.file.write(b''.join(_ACTION_BYTES[action]
+                                 for _, action in moveHistory))
+        self.endGame()
+
+    def close(self):
+        self.file.close()
+
+
+class GameArchive:
+    """
+    A memory-mapped recording file, indexed by game.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.games = []
+        self.data = None
+        if self.file.seek(0, 2) == 0:
+            return
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Index the games; move bytes are never END_OF_GAME
+        offset = 0
+        size = len(self.data)
+        while offset < size:
+            magic, fingerprint, seed, numAgents = HEADER.unpack_from(
+                self.data, offset)
+            if magic != MAGIC:
+                raise Exception("Corrupted recording at byte %d of %s" %
+                                (offset, path))
+            start = offset + HEADER.size
+            end = self.data.find(bytes([END_OF_GAME]), start)
+            if end < 0:
+                # Unfinished game
+                end = size
+            self.games.append((fingerprint, None if seed < 0 else seed,
+                               numAgents, start, end))
+            offset = end + 1
+
+    def __len__(self):
+        return len(self.games)
+
+    def getReplay(self, index, layout, checkpointInterval=64):
+        """
+        Returns the replay of game `index`, played on `layout`.
+        """
+        fingerprint, seed, numAgents, start, end = self.games[index]
+        if fingerprint != layout.getFingerprint():
+            raise Exception("Game %d of %s was not played on this layout" %
+                            (index, self.path))
+        return GameReplay(self.data, start, end, layout, numAgents, seed,
+                          checkpointInterval)
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+
+class GameReplay:
+    """
+    A recorded game. Moves are read from the memory-mapped archive and the
+    states reached are checkpointed every `checkpointInterval` moves.
+    """
+
+    def __init__(self, data, start, end, layout, numAgents, seed,
+                 checkpointInterval=64):
+        from .pacman import GameState
+        self.data = data
+        self.start = start
+        self.layout = layout
+        self.numAgents = numAgents
+        self.seed = seed
+        self.numMoves = end - start
+        self.checkpointInterval = checkpointInterval
+        initState = GameState()
+        initState.initialize(layout, numAgents - 1)
+        self.checkpoints = {0: initState}
+
+    def __len__(self):
+        return self.numMoves
+
+    def getMove(self, ply):
+        """
+        Returns the (agentIndex, action) pair of move `ply`.
+        """
+        if not 0 <= ply < self.numMoves:
+            raise IndexError(ply)
+        return ply % self.numAgents, ACTIONS[self.data[self.start + ply]]
+
+    def getMoves(self):
+        """
+        Returns the move history of the game.
+        """
+        return [self.getMove(ply) for ply in range(self.numMoves)]
+
+    def getState(self, ply):
+        """
+        Returns the state of the game after `ply` moves.
+        """
+        if not 0 <= ply <= self.numMoves:
+            raise IndexError(ply)
+        interval = self.checkpointInterval
+        current = ply // interval * interval
+        while current not in self.checkpoints:
+            current -= interval
+        state = self.checkpoints[current]
+        for i in range(current, ply):
+            state = state.generateSuccessor(*self.getMove(i))
+            if (i + 1) % interval == 0:
+                self.checkpoints[i + 1] = state
+        return state
@@ -0,0 +1,338 @@
+# remote.py
+# ---------
+# Agents playing out of process, kept in sync through per-move deltas.
+
+"""
+A RemoteAgent stands in the game for an agent running in a worker process.
+The worker mirrors the game state instead of receiving it at every move:
+
+  - when a game starts, the agent sends the layout (only the first time it
+    is played), the number of ghosts, the hash of the starting state, and
+    a seed drawn from the game's random number generator (see
+    Game.seedAgents), from which the worker seeds its agent's;
+  - after every move of the game, the agent queues a delta: the index of
+    the agent that moved, its action, and the score change, food and
+    capsule eaten that followed;
+  - when it is asked for a move, the agent sends the queued deltas along
+    with the request. The worker plays them on its mirrored state, checks
+    them and the state hash against its own, and answers with the move of
+    the agent it serves.
+
+The observation given to the agent is never copied or sent. An agent that
+raises or does not answer before the move deadline loses the move, not the
+game: it plays its previous move again if it is still legal, and its first
+legal move otherwise. Only a worker that dies or whose mirrored state goes
+out of sync is given up on for the rest of the game.
+
+Transports carry the messages:
+
+  - 'pipe' runs the worker in a process connected by a pipe;
+  - 'socket' runs the worker in a process connected by a local socket;
+  - 'local' serves the agent in the current process, pickling the messages
+    both ways, as a stand-in for testing.
+
+Workers are started when their first game starts, so RemoteAgents can be
+built before the game, but they must be played from the main process.
+"""
+
+import multiprocessing
+import os
+import pickle
+import random
+import time
+import traceback
+from multiprocessing.connection import Client, Listener
+
+from .game import Agent, Game
+from .layout import Layout
+from .pacman import GameState
+from .recording import ACTIONS
+
+_ACTION_CODES = dict((action, code) for code, action in enumerate(ACTIONS))
+
+TRANSPORTS = ('local', 'pipe', 'socket')
+
+
+class AgentServer:
+    """
+    Serves an agent on a mirrored game state. `handle` answers one message
+    of a RemoteAgent.
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.layouts = {}
+        self.state = None
+
+    def handle(self, message):
+        kind = message[0]
+        if kind == 'start':
+            _, fingerprint, layoutText, numGhostAgents, key, seed = message
+            if layoutText is not None:
+                self.layouts[fingerprint] = Layout(layoutText)
+            self.agent.rng = random if seed is None else random.Random(seed)
+            self.state = GameState()
+            self.state.initialize(self.layouts[fingerprint], numGhostAgents)
+            if hash(self.state) != key:
+                self.state = None
+                return (None, None, "Starting state is not the layout's",
+                        False)
+            return None
+        if kind == 'act':
+            # Replies say whether the mirrored state is still in sync
+            _, requestId, deltas, key, agentIndex, moveTime = message
+            try:
+                self.play(deltas, key)
+            except Exception:
+                return (requestId, None, traceback.format_exc(), False)
+            try:
+                action = Game.getAgentAction(
+                    self.agent, self.state.snapshot(), moveTime)
+            except Exception:
+                return (requestId, None, traceback.format_exc(), True)
+            return (requestId, action, None, True)
+        raise Exception("Unknown message: %r" % (kind,))
+
+    def play(self, deltas, key):
+        """
+        Plays `deltas` on the mirrored state and checks that it ends up in
+        the state whose hash is `key`.
+        """
+        if self.state is None:
+            raise Exception("No game started")
+        state = self.state
+        for agentIndex, code, scoreChange, foodEaten, capsuleEaten in deltas:
+            state = state.generateSuccessor(agentIndex, ACTIONS[code])
+            data = state.data
+            if (data.scoreChange != scoreChange
+                    or data._foodEaten != foodEaten
+                    or data._capsuleEaten != capsuleEaten):
+                self.state = None
+                raise Exception("Mirrored state out of sync")
+        self.state = state
+        if hash(state) != key:
+            self.state = None
+            raise Exception("Mirrored state out of sync")
+
+
+def serveAgent(connection, factory):
+    """
+    Worker loop: builds the agent with `factory` and answers the messages
+    received on `connection` until it is told to stop or closed.
+    """
+    server = AgentServer(factory())
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message[0] == 'stop':
+            break
+        reply = server.handle(message)
+        if reply is not None:
+            connection.send(reply)
+    connection.close()
+
+
+def _connectAndServe(address, authkey, factory):
+    serveAgent(Client(address, authkey=authkey), factory)
+
+
+class LocalTransport:
+    """
+    Serves the agent in the current process, pickling messages and replies
+    like the other transports do.
+    """
+
+    def __init__(self, factory):
+        self.server = AgentServer(factory())
+        self.replies = []
+
+    def send(self, message):
+        reply = self.server.handle(pickle.loads(pickle.dumps(message)))
+        if reply is not None:
+            self.replies.append(pickle.dumps(reply))
+
+    def poll(self, timeout=None):
+        return bool(self.replies)
+
+    def recv(self):
+        if not self.replies:
+            raise EOFError
+        return pickle.loads(self.replies.pop(0))
+
+    def close(self):
+        self.server = None
+
+
+class ProcessTransport:
+    """
+    Serves the agent in a worker process, over a pipe or a local socket.
+    """
+
+    def __init__(self, factory, kind='pipe'):
+        if kind == 'pipe':
+            self.connection, child = multiprocessing.Pipe()
+            self.process = multiprocessing.Process(
+                target=serveAgent, args=(child, factory), daemon=True)
+            self.process.start()
+            child.close()
+        else:
+            authkey = os.urandom(16)
+            with Listener(authkey=authkey) as listener:
+                self.process = multiprocessing.Process(
+                    target=_connectAndServe,
+                    args=(listener.address, authkey, factory), daemon=True)
+                self.process.start()
+                self.connection = listener.accept()
+
+    def send(self, message):
+        self.connection.send(message)
+
+    def poll(self, timeout=None):
+        return self.connection.poll(timeout)
+
+    def recv(self):
+        return self.connection.recv()
+
+    def close(self):
+        try:
+            self.connection.send(('stop',))
+        except (OSError, ValueError):
+            pass
+        self.connection.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class RemoteAgent(Agent):
+    """
+    Plays the agent built by `factory` (a picklable callable, such as
+    `functools.partial(SmartyGhost, 1)`) in a worker reached through
+    `transport`, one of TRANSPORTS.
+
+    Without a move deadline, the agent waits `timeout` seconds at most for
+    each move of the worker (forever if None).
+    """
+
+    def __init__(self, index, factory, transport='pipe', timeout=None):
+        if transport not in TRANSPORTS:
+            raise Exception("Unknown transport: %r" % (transport,))
+        self.index = index
+        self.factory = factory
+        self.transport = transport
+        self.timeout = timeout
+        self.connection = None
+        self.crashed = False
+        self.fingerprints = set()
+        self.deltas = []
+        self.requestId = 0
+        self.lastAction = None
+
+    def __getstate__(self):
+        # Workers are not shared: a copy starts its own
+        state = self.__dict__.copy()
+        state['connection'] = None
+        state['fingerprints'] = set()
+        return state
+
+    def connect(self):
+        if self.transport == 'local':
+            self.connection = LocalTransport(self.factory)
+        else:
+            self.connection = ProcessTransport(self.factory, self.transport)
+        self.fingerprints = set()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def observe_start(self, state):
+        # A worker that crashed in the previous game is replaced
+        if self.connection is None or self.crashed:
+            self.close()
+            self.connect()
+        layout = state.data.layout
+        fingerprint = layout.getFingerprint()
+        layoutText = None
+        if fingerprint not in self.fingerprints:
+            layoutText = layout.layoutText
+            self.fingerprints.add(fingerprint)
+        self.deltas = []
+        self.crashed = False
+        self.lastAction = None
+        # Unseeded games leave the worker on its global random module
+        seed = None
+        if self.rng is not random:
+            seed = self.rng.getrandbits(64)
+        self.send(('start', fingerprint, layoutText,
+                   state.getNumAgents() - 1, hash(state), seed))
+
+    def observe_move(self, agentIndex, action, state):
+        data = state.data
+        self.deltas.append((agentIndex, _ACTION_CODES[action],
+                            data.scoreChange, data._foodEaten,
+                            data._capsuleEaten))
+
+    def send(self, message):
+        if self.crashed:
+            return False
+        try:
+            self.connection.send(message)
+        except (OSError, ValueError):
+            self.crash()
+            return False
+        return True
+
+    def crash(self, error=None):
+        if error is not None:
+            print(error)
+        print("Remote agent %d crashed !" % self.index)
+        self.crashed = True
+
+    def fallback(self, state):
+        legal = state.getLegalActions(self.index)
+        if self.lastAction in legal:
+            return self.lastAction
+        return legal[0]
+
+    def get_action(self, state):
+        self.requestId += 1
+        deadline = state.getDeadline()
+        moveTime = None
+        if deadline is not None:
+            moveTime = max(0., deadline - time.monotonic())
+        elif self.timeout is not None:
+            deadline = time.monotonic() + self.timeout
+        deltas, self.deltas = self.deltas, []
+        if not self.send(('act', self.requestId, deltas, hash(state),
+                          self.index, moveTime)):
+            return self.fallback(state)
+
+        try:
+            while True:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(0., deadline - time.monotonic())
+                if not self.connection.poll(timeout):
+                    print("Remote agent %d missed its move !" % self.index)
+                    return self.fallback(state)
+                requestId, action, error, synced = self.connection.recv()
+                # Replies to requests given up on are dropped
+                if requestId is None or requestId == self.requestId:
+                    break
+        except (EOFError, OSError):
+            self.crash()
+            return self.fallback(state)
+
+        if error is not None:
+            if not synced:
+                self.crash(error)
+            else:
+                print(error)
+                print("Remote agent %d failed its move !" % self.index)
+            return self.fallback(state)
+        self.lastAction = action
+        return action
@@ -496,10 +496,10 @@ def normalize(vectorOrCounter):
         return [el / s for el in vector]
 
 
-def nSample(distribution, values, n):
+def nSample(distribution, values, n, rng=random):
     if sum(distribution) != 1:
         distribution = normalize(distribution)
-    rand = sorted([random.random() for i in range(n)])
+    rand = sorted([rng.random() for i in range(n)])
     samples = []
     samplePos, distPos, cdf = 0, 0, distribution[0]
     while samplePos < n:
@@ -512,14 +512,14 @@ def nSample(distribution, values, n):
     return samples
 
 
-def sample(distribution, values=None):
+def sample(distribution, values=None, rng=random):
     if isinstance(distribution, Counter):
         items = sorted(distribution.items())
         distribution = [i[1] for i in items]
         values = [i[0] for i in items]
     if sum(distribution) != 1:
         distribution = normalize(distribution)
-    choice = random.random()
+    choice = rng.random()
     i, total = 0, distribution[0]
     while choice > total:
         i += 1
@@ -544,16 +544,16 @@ def getProbability(value, distribution, values):
     return total
 
 
-def flipCoin(p):
-    r = random.random()
+def flipCoin(p, rng=random):
+    r = rng.random()
     return r < p
 
 
-def chooseFromDistribution(distribution):
+def chooseFromDistribution(distribution, rng=random):
     "Takes either a counter or a list of (prob, key) pairs and samples"
     if isinstance(distribution, dict) or isinstance(distribution, Counter):
-        return sample(distribution)
-    r = random.random()
+        return sample(distribution, rng=rng)
+    r = rng.random()
     base = 0.0
     for prob, element in distribution:
         base += prob
@@ -658,6 +658,15 @@ class TimeoutFunctionException(Exception):
     pass
 
 
+class DeadlineExceededException(Exception):
+    """
+    Exception raised by node expansions once the move deadline of the agent
+    has passed (see ExpansionContext). Unlike TimeoutFunction, it needs no
+    signal and works in any thread.
+    """
+    pass
+
+
 class TimeoutFunction:
     def __init__(self, function, timeout):
         self.timeout = timeout
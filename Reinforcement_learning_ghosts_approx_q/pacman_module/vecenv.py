@@ -0,0 +1,273 @@
+# vecenv.py
+# ---------
+# Batched simulator running many independent games of classic Pacman in
+# lockstep, for reinforcement learning.
+
+"""
+VecEnv advances N independent games of the same layout in lockstep. The
+state of every game lives in NumPy arrays and each step applies the
+PacmanRules/GhostRules semantics to all games at once:
+
+  - positions are stored in doubled coordinates, so that the half-speed
+    moves of scared ghosts stay integral;
+  - food and capsules are boolean masks over the cells of the layout;
+  - ghosts play a vectorized version of GreedyGhost or DumbyGhost.
+
+A step plays one round: Pacman moves, then each ghost in turn while the
+game is not over, exactly like Game.run. Finished games are reset
+automatically.
+"""
+
+import numpy as np
+
+from .game import Directions
+from .ghostAgents import DumbyGhost, GreedyGhost
+from .pacman import SCARED_TIME, TIME_PENALTY
+
+NORTH, SOUTH, EAST, WEST, STOP = range(5)
+
+# Moves in doubled coordinates, indexed by action code
+_VECTORS = np.array([(0, 2), (0, -2), (2, 0), (-2, 0), (0, 0)])
+
+# For DumbyGhost: left, straight, right then back, by current heading
+_DUMBY_ORDER = np.array([(WEST, NORTH, EAST, SOUTH),
+                         (EAST, SOUTH, WEST, NORTH),
+                         (NORTH, EAST, SOUTH, WEST),
+                         (SOUTH, WEST, NORTH, EAST),
+                         (WEST, NORTH, EAST, SOUTH)])
+
+
+class VecEnv:
+    """
+    A batch of `numEnvs` games of `layout` played in lockstep.
+
+    Actions are indices into VecEnv.ACTIONS. Illegal Pacman actions are
+    replaced by STOP.
+    """
+    ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST,
+               Directions.WEST, Directions.STOP]
+
+    # Observation planes
+    WALLS, FOOD, CAPSULES, PACMAN, GHOSTS, SCARED_GHOSTS = range(6)
+
+    def __init__(self, layout, numEnvs, ghostType=GreedyGhost,
+                 numGhosts=None):
+        if ghostType not in (GreedyGhost, DumbyGhost):
+            raise Exception("VecEnv only runs GreedyGhost and DumbyGhost")
+        if numGhosts is None:
+            numGhosts = layout.getNumGhosts()
+        self.layout = layout
+        self.numEnvs = numEnvs
+        self.ghostType = ghostType
+        self.width = layout.width
+        self.height = layout.height
+        numCells = self.width * self.height
+
+        # Compile the move table of the layout into arrays
+        table = layout.getMoveTable()
+        self.pacmanLegal = np.zeros((numCells, 5), dtype=bool)
+        self.ghostLegal = np.zeros((numCells, 5, 4), dtype=bool)
+        for (x, y), possible in table.actions.items():
+            cell = x * self.height + y
+            for action in possible:
+                self.pacmanLegal[cell, self.ACTIONS.index(action)] = True
+            for heading in range(5):
+                ghostActions = table.ghostActions[(
+                    (x, y), self.ACTIONS[heading])]
+                for action in ghostActions:
+                    self.ghostLegal[cell, heading,
+                                    self.ACTIONS.index(action)] = True
+
+        self.walls = np.array(
+            [[layout.walls[x][y] for y in range(self.height)]
+             for x in range(self.width)], dtype=bool)
+        self.initialFood = np.zeros(numCells, dtype=bool)
+        for x, y in layout.food.asList():
+            self.initialFood[x * self.height + y] = True
+        self.initialCapsules = np.zeros(numCells, dtype=bool)
+        for x, y in layout.capsules:
+            self.initialCapsules[x * self.height + y] = True
+
+        starts = [pos for isPacman, pos in layout.agentPositions if isPacman]
+        starts += [pos for isPacman, pos in layout.agentPositions
+                   if not isPacman][:numGhosts]
+        self.numGhosts = len(starts) - 1
+        self.starts = 2 * np.array(starts, dtype=np.int64)
+
+        n = numEnvs
+        self.positions = np.zeros((n, self.numGhosts + 1, 2), dtype=np.int64)
+        self.directions = np.zeros((n, self.numGhosts + 1), dtype=np.int64)
+        self.scaredTimers = np.zeros((n, self.numGhosts), dtype=np.int64)
+        self.scores = np.zeros(n, dtype=np.int64)
+        self.food = np.zeros((n, numCells), dtype=bool)
+        self.numFood = np.zeros(n, dtype=np.int64)
+        self.capsules = np.zeros((n, numCells), dtype=bool)
+        self.episodeScores = np.zeros(n, dtype=np.int64)
+        self.episodeWins = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def reset(self):
+        """
+        Resets every game and returns the observations and legal masks.
+        """
+        self._resetEnvs(np.ones(self.numEnvs, dtype=bool))
+        return self.getObservations(), self.getLegalMasks()
+
+    def _resetEnvs(self, mask):
+        self.positions[mask] = self.starts
+        self.directions[mask] = STOP
+        self.scaredTimers[mask] = 0
+        self.scores[mask] = 0
+        self.food[mask] = self.initialFood
+        self.numFood[mask] = self.initialFood.sum()
+        self.capsules[mask] = self.initialCapsules
+
+    def step(self, actions):
+        """
+        Plays one round in every game: Pacman plays `actions`, then the
+        ghosts move. Games that end are reset.
+
+        Returns the observations, rewards (score changes), done flags and
+        legal action masks. The final score and outcome of the games that
+        just ended are in `episodeScores` and `episodeWins`.
+        """
+        rows = np.arange(self.numEnvs)
+        actions = np.asarray(actions, dtype=np.int64)
+        startScores = self.scores.copy()
+        win = np.zeros(self.numEnvs, dtype=bool)
+        lose = np.zeros(self.numEnvs, dtype=bool)
+
+        # Pacman moves; he is always on a grid point
+        pacman = self.positions[:, 0]
+        cells = self._cells(pacman)
+        actions = np.where(
+            self.pacmanLegal[cells, actions], actions, STOP)
+        pacman += _VECTORS[actions]
+        self.directions[:, 0] = np.where(
+            actions != STOP, actions, self.directions[:, 0])
+
+        # Eat food and capsules
+        cells = self._cells(pacman)
+        ate = self.food[rows, cells]
+        self.food[rows, cells] = False
+        self.numFood -= ate
+        self.scores += 10 * ate
+        cleared = ate & (self.numFood == 0)
+        self.scores += 500 * cleared
+        win |= cleared
+        capsule = self.capsules[rows, cells]
+        self.capsules[rows, cells] = False
+        self.scaredTimers[capsule] = SCARED_TIME
+        self.scores -= TIME_PENALTY
+
+        # Pacman just moved; anyone can kill him
+        playing = np.ones(self.numEnvs, dtype=bool)
+        for ghost in range(self.numGhosts):
+            self._checkDeath(ghost, playing, win, lose)
+
+        # Ghosts move in turn while the game goes on
+        for ghost in range(self.numGhosts):
+            playing = ~(win | lose)
+            self._moveGhost(ghost, playing)
+            self._checkDeath(ghost, playing, win, lose)
+
+        rewards = self.scores - startScores
+        done = win | lose
+        self.episodeScores = np.where(done, self.scores, self.episodeScores)
+        self.episodeWins = np.where(done, win, self.episodeWins)
+        if done.any():
+            self._resetEnvs(done)
+        return self.getObservations(), rewards, done, self.getLegalMasks()
+
+    def _cells(self, positions):
+        return (positions[:, 0] // 2) * self.height + positions[:, 1] // 2
+
+    def _checkDeath(self, ghost, playing, win, lose):
+        distance = np.abs(
+            self.positions[:, 0] - self.positions[:, ghost + 1]).sum(axis=1)
+        # Doubled coordinates: COLLISION_TOLERANCE of 0.7 is 1.4
+        kill = playing & (distance <= 1)
+        scared = self.scaredTimers[:, ghost] > 0
+        eaten = kill & scared
+        self.scores += 200 * eaten
+        self.positions[eaten, ghost + 1] = self.starts[ghost + 1]
+        self.directions[eaten, ghost + 1] = STOP
+        self.scaredTimers[eaten, ghost] = 0
+        died = kill & ~scared & ~win
+        self.scores -= 500 * died
+        lose |= died
+
+    def _moveGhost(self, ghost, playing):
+        position = self.positions[:, ghost + 1]
+        heading = self.directions[:, ghost + 1]
+        timer = self.scaredTimers[:, ghost]
+        scared = timer > 0
+
+        # Off grid points ghosts can only keep going
+        onGrid = (position % 2 == 0).all(axis=1)
+        legal = self.ghostLegal[self._cells(position), heading]
+        straight = np.zeros((self.numEnvs, 4), dtype=bool)
+        offGrid = ~onGrid & (heading < STOP)
+        straight[offGrid, heading[offGrid]] = True
+        legal = np.where(onGrid[:, None], legal, straight)
+
+        if self.ghostType is GreedyGhost:
+            actions = self._greedyActions(position, scared, legal)
+        else:
+            actions = self._dumbyActions(heading, legal)
+
+        speed = np.where(scared, 1, 2)
+        move = _VECTORS[actions] // 2 * speed[:, None]
+        position += np.where(playing[:, None], move, 0)
+        heading[:] = np.where(playing, actions, heading)
+
+        # Scared timers run out, snapping the ghost back on the grid
+        snap = playing & (timer == 1)
+        position[snap] = (position[snap] + 1) // 2 * 2
+        timer[:] = np.where(playing, np.maximum(0, timer - 1), timer)
+
+    def _greedyActions(self, position, scared, legal):
+        speed = np.where(scared, 1, 2)
+        moved = position[:, None, :] + \
+            _VECTORS[None, :4] // 2 * speed[:, None, None]
+        distance = np.abs(
+            moved - self.positions[:, None, 0]).sum(axis=2)
+        # Chase Pacman, or flee when scared; ties go to the first action
+        # in legal order like GreedyGhost
+        chase = np.where(legal, distance, np.iinfo(np.int64).max)
+        flee = np.where(legal, distance, -1)
+        return np.where(scared, flee.argmax(axis=1), chase.argmin(axis=1))
+
+    def _dumbyActions(self, heading, legal):
+        order = _DUMBY_ORDER[heading]
+        allowed = np.take_along_axis(legal, order, axis=1)
+        # With no move of the order allowed, DumbyGhost stops
+        return np.where(allowed.any(axis=1),
+                        order[np.arange(self.numEnvs), allowed.argmax(axis=1)],
+                        STOP)
+
+    def getLegalMasks(self):
+        """
+        Returns a (numEnvs, 5) boolean array of the legal Pacman actions.
+        """
+        return self.pacmanLegal[self._cells(self.positions[:, 0])]
+
+    def getObservations(self):
+        """
+        Returns a (numEnvs, 6, width, height) float32 array of board planes:
+        walls, food, capsules, Pacman, ghosts and scared ghosts.
+        """
+        n, w, h = self.numEnvs, self.width, self.height
+        obs = np.zeros((n, 6, w * h), dtype=np.float32)
+        obs[:, self.WALLS] = self.walls.reshape(-1)
+        obs[:, self.FOOD] = self.food
+        obs[:, self.CAPSULES] = self.capsules
+        rows = np.arange(n)
+        obs[rows, self.PACMAN, self._cells(self.positions[:, 0])] = 1
+        for ghost in range(self.numGhosts):
+            # Ghosts between two cells are seen at the nearest one
+            cells = self._cells((self.positions[:, ghost + 1] + 1) // 2 * 2)
+            scared = self.scaredTimers[:, ghost] > 0
+            obs[rows, np.where(scared, self.SCARED_GHOSTS, self.GHOSTS),
+                cells] = 1
+        return obs.reshape(n, 6, w, h)
@@ -0,0 +1,128 @@
+# visibility.py
+# -------------
+# Straight line-of-sight visibility between the cells of a layout.
+
+"""
+A VisibilityIndex tells, for every cell of a layout and every direction
+Pacman can face, which cells he sees: the cells in a straight line ahead of
+him, up to the first wall. Facing STOP, he sees nothing.
+
+The index stores the number of free cells in a straight line ahead of every
+cell, by direction, computed with numpy and cached with
+layout.loadCachedArray. A cell is seen when it lies on the line of sight
+and no further ahead than that run, so that testing visibility costs a few
+comparisons, and the index takes one int per cell and direction.
+"""
+
+import numpy as np
+
+from .game import Directions
+
+# Directions of the runs, in the order of the index
+DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST,
+              Directions.WEST]
+
+
+class VisibilityIndex:
+    """
+    Line-of-sight visibility of `layout`. Positions are (x, y) points of the
+    layout; ghosts between two grid points are seen when either of the two
+    points is.
+    """
+
+    def __init__(self, layout):
+        from .layout import loadCachedArray
+        self.width = layout.width
+        self.height = layout.height
+        self.directionIds = dict((d, i) for i, d in enumerate(DIRECTIONS))
+        self.walls = np.array(
+            [[layout.walls[x][y] for y in range(self.height)]
+             for x in range(self.width)], dtype=bool)
+        self.runs = loadCachedArray(
+            'visibility-%s.i32' % layout.getFingerprint().hex(),
+            (len(DIRECTIONS), self.width, self.height), np.int32,
+            self.computeRuns)
+        self.intMasks = {}
+
+    def computeRuns(self):
+        """
+        Returns the number of free cells in a straight line ahead of every
+        cell, by direction: an int array indexed by direction, x and y.
+        """
+        free = ~self.walls
+        runs = np.zeros((len(DIRECTIONS),) + free.shape, dtype=np.int32)
+        north, south, east, west = (self.directionIds[d] for d in DIRECTIONS)
+        # Each run extends the run of the next cell, if that cell is free
+        for y in range(self.height - 2, -1, -1):
+            runs[north, :, y] = free[:, y + 1] * (runs[north, :, y + 1] + 1)
+        for y in range(1, self.height):
+            runs[south, :, y] = free[:, y - 1] * (runs[south, :, y - 1] + 1)
+        for x in range(self.width - 2, -1, -1):
+            runs[east, x] = free[x + 1] * (runs[east, x + 1] + 1)
+        for x in range(1, self.width):
+            runs[west, x] = free[x - 1] * (runs[west, x - 1] + 1)
+        # Walls see nothing
+        runs[:, self.walls] = 0
+        return runs
+
+    def getRun(self, pos, direction):
+        """
+        Returns the number of cells seen from `pos` facing `direction`.
+        """
+        i = self.directionIds.get(direction)
+        if i is None:
+            return 0
+        return int(self.runs[i, int(pos[0]), int(pos[1])])
+
+    def getVisibleMask(self, pos, direction):
+        """
+        Returns the cells seen from `pos` facing `direction`, as an int
+        bitmask in the bit order of game.Grid.
+        """
+        x, y = (int(c) for c in pos)
+        key = (x, y, direction)
+        mask = self.intMasks.get(key)
+        if mask is None:
+            run = self.getRun((x, y), direction)
+            dx, dy = {Directions.NORTH: (0, 1), Directions.SOUTH: (0, -1),
+                      Directions.EAST: (1, 0), Directions.WEST: (-1, 0)
+                      }.get(direction, (0, 0))
+            mask = 0
+            for k in range(1, run + 1):
+                mask |= 1 << ((x + k * dx) * self.height + y + k * dy)
+            self.intMasks[key] = mask
+        return mask
+
+    def isCellVisible(self, pos, direction, cell):
+        x, y = int(pos[0]), int(pos[1])
+        cx, cy = cell
+        if direction == Directions.NORTH:
+            inLine, ahead = cx == x, cy - y
+        elif direction == Directions.SOUTH:
+            inLine, ahead = cx == x, y - cy
+        elif direction == Directions.EAST:
+            inLine, ahead = cy == y, cx - x
+        elif direction == Directions.WEST:
+            inLine, ahead = cy == y, x - cx
+        else:
+            return False
+        return inLine and 0 < ahead <= self.getRun((x, y), direction)
+
+    def isVisible(self, pos, direction, target):
+        """
+        Returns whether `target` is seen from `pos` facing `direction`.
+        """
+        tx, ty = target
+        if tx == int(tx) and ty == int(ty):
+            return self.isCellVisible(pos, direction, (int(tx), int(ty)))
+        # A target between two grid points is seen along the line of sight
+        # only, when either of the two points is
+        if direction in (Directions.NORTH, Directions.SOUTH):
+            if tx != int(pos[0]):
+                return False
+            cells = [(int(tx), int(ty)), (int(tx), int(ty) + 1)]
+        else:
+            if ty != int(pos[1]):
+                return False
+            cells = [(int(tx), int(ty)), (int(tx) + 1, int(ty))]
+        return any(self.isCellVisible(pos, direction, cell) for cell in cells)
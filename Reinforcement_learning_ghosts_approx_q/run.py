@@ -1,9 +1,11 @@
+import functools
 import imp
 import os
 from argparse import ArgumentParser, ArgumentTypeError
 
 from pacman_module.pacman import runGame
 from pacman_module.ghostAgents import GreedyGhost, SmartyGhost, DumbyGhost
+from pacman_module.remote import TRANSPORTS, RemoteAgent
 
 
 def restricted_float(x):
@@ -68,6 +70,11 @@ if __name__ == '__main__':
         '--silentdisplay',
         help="Disable the graphical display of the game.",
         action="store_true")
+    parser.add_argument(
+        '--remote',
+        help='Run the ghost agents in worker processes reached through '
+             'this transport.',
+        choices=TRANSPORTS, default=None)
 
     args = parser.parse_args()
 
@@ -80,11 +87,18 @@ if __name__ == '__main__':
     nghosts = 2
     if (nghosts > 0):
         gagts = [gagt(i + 1) for i in range(nghosts)]
+        if args.remote is not None:
+            gagts = [RemoteAgent(i + 1, functools.partial(gagt, i + 1),
+                                 args.remote) for i in range(nghosts)]
     else:
         gagts = []
     total_score, total_computation_time, total_expanded_nodes = runGame(
         args.layout, agent, gagts, not args.silentdisplay, expout=0)
 
+    if args.remote is not None:
+        for gagt in gagts:
+            gagt.close()
+
     print("Total score : " + str(total_score))
     print("Total computation time (seconds) : " + str(total_computation_time))
     print("Total expanded nodes : " + str(total_expanded_nodes))
@@ -1,6 +1,7 @@
 import imp
 import os
 import csv
+import pickle
 import statistics
 import matplotlib.pyplot as plt
 from argparse import ArgumentParser, ArgumentTypeError
@@ -10,9 +11,10 @@ import numpy as np
 
 from pacman_module.pacman import runGame
 from pacman_module.pacman import runGames
+from pacman_module.pacman import iterGames
 from pacman_module.ghostAgents import GreedyGhost, SmartyGhost, DumbyGhost
 
-from pacman_module import util, layout
+from pacman_module import util, layout, mazes
 from pacman_module import textDisplay, graphicsDisplay
 
 
@@ -30,29 +32,18 @@ def positive_integer(x):
     return x
 
 
-def layout_thin_borders(layout, thickness):
-    if thickness <= 1:
-        return layout
-    w = thickness-1
-    lay = layout.replace(".lay", "")
-    with open("pacman_module/layouts/" + lay + ".lay") as f:
-        list_lines = f.readlines()
-    old_len = len(list_lines)
-    for _ in range(w * 2):
-        list_lines[0] = '%' + list_lines[0]
-        list_lines[-1] = '%' + list_lines[-1]
-    for _ in range(w):
-        list_lines.insert(0, list_lines[0])
-        list_lines.append(list_lines[0])
-    for i in range(w+1, len(list_lines) - w-1):
-        list_lines[i] = list_lines[i].replace("\n", "")
-        for _ in range(w):
-            list_lines[i] += '%'
-            list_lines[i] = '%' + list_lines[i]
-        list_lines[i] += "\n"
-    with open("pacman_module/layouts/" + lay + "_thicker.lay", "w+") as f:
-        f.writelines(list_lines)
-    return lay + "_thicker.lay"
+def layout_thin_borders(layout_name, thickness):
+    """
+    Returns the layout `layout_name` with borders `thickness` walls thick,
+    built in memory.
+
+    The `_thicker.lay` files written before padded the raw lines of the
+    layout files. Lines ending with whitespace (medium_adv, small_adv and
+    small_adv2) thus got open cells in their right border, which the
+    padded layouts built here do not have. Those cells were out of reach
+    of the agents, so the same games are played on both.
+    """
+    return mazes.padBorders(layout.getLayout(layout_name), thickness)
 
 
 def load_agent_from_file(filepath, class_module):
@@ -72,6 +63,60 @@ def load_agent_from_file(filepath, class_module):
     return class_mod
 
 
+# Agent attributes saved in checkpoints: the learned parameters, the
+# episode counter, and what the agent carries from one game to the next.
+CHECKPOINT_ATTRIBUTES = ['weights', 'Q_values', 'episodes_total', 'score',
+                         'last_state', 'last_action']
+
+
+def save_checkpoint(path, agent, sweep):
+    """
+    Saves the learned state of `agent`, the random number generator
+    states and the results of the completed sweep points to `path`.
+
+    Of the states and actions the agent remembers, only the latest ones are
+    saved: they are the only ones it reads.
+    """
+    agent_state = {}
+    for name in CHECKPOINT_ATTRIBUTES:
+        if hasattr(agent, name):
+            value = getattr(agent, name)
+            if name in ('last_state', 'last_action'):
+                value = value[-1:]
+            agent_state[name] = value
+    checkpoint = {
+        'agent': agent_state,
+        'random': random.getstate(),
+        'numpy': np.random.get_state(),
+        'sweep': sweep,
+    }
+    # Write then rename, so that a crash never leaves a partial checkpoint
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(checkpoint, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+
+def load_checkpoint(path, agent):
+    """
+    Restores the agent and random number generator states saved by
+    save_checkpoint and returns the results of the completed sweep points.
+    """
+    with open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    for name, value in checkpoint['agent'].items():
+        setattr(agent, name, value)
+    random.setstate(checkpoint['random'])
+    np.random.set_state(checkpoint['numpy'])
+    return checkpoint['sweep']
+
+
+# Options changing the games played, which a resumed sweep must share with
+# its checkpoint. The random number generators are restored from the
+# checkpoint, so the seed is not one of them.
+SWEEP_OPTIONS = ['agentfile', 'ghostagent', 'layout', 'nghosts', 'w', 'p',
+                 'maxmoves', 'stallwindow']
+
+
 ghosts = {}
 ghosts["greedy"] = GreedyGhost
 ghosts["smarty"] = SmartyGhost
@@ -127,6 +172,24 @@ def main():
         '--p',
         help='Parameter p as specified in instructions for Project Part 3.',
         type=float, default=0.5)
+    parser.add_argument(
+        '--maxmoves',
+        help='Number of moves (of all agents) after which a game is '
+             'truncated.',
+        type=positive_integer, default=2000)
+    parser.add_argument(
+        '--stallwindow',
+        help='Number of Pacman moves over which a game going round in '
+             'circles is truncated.',
+        type=positive_integer, default=100)
+    parser.add_argument(
+        '--checkpoint',
+        help='File the sweep is checkpointed to after each point.',
+        default='runs_checkpoint.pkl')
+    parser.add_argument(
+        '--resume',
+        help='Resume the sweep from the checkpoint file.',
+        action="store_true")
 
     args = parser.parse_args()
 
@@ -152,8 +215,7 @@ def main():
     else:
         gagts = []
 
-    #layout = layout_thin_borders(args.layout, args.w)
-    layout_name = layout_thin_borders(args.layout, args.w)
+    lay = layout_thin_borders(args.layout, args.w)
     bsagt = None
     if args.bsagentfile is not None:
         bsagt = load_agent_from_file(
@@ -163,7 +225,6 @@ def main():
     #    layout, agent, gagts, bsagt, not args.silentdisplay,
     #    expout=0, hiddenGhosts=args.hiddenghosts)
 
-    lay = layout.getLayout(layout_name)
     display = graphicsDisplay.PacmanGraphics(
         1.0, frameTime=0.1) if (not args.silentdisplay) else textDisplay.NullGraphics()
     
@@ -176,40 +237,66 @@ def main():
     num_training = [25,50,100,200,300,400,500,600,700,800,900,1000,1100,1200,1300,1400,1500]
     #num_training = [0]
 
-    mean_scores = []
-    win_rates = []
-    execution_times = []
-
-    # Write the header to the CSV file once
+    # Results of the completed sweep points
+    sweep = {'args': vars(args), 'points': [], 'rows': [],
+             'mean_scores': [], 'win_rates': [], 'execution_times': []}
+    if args.resume:
+        sweep = load_checkpoint(args.checkpoint, agent)
+        for name in SWEEP_OPTIONS:
+            if sweep['args'].get(name) != getattr(args, name):
+                raise Exception("--%s differs from the checkpointed sweep"
+                                % name)
+        print("Resuming after " + str(sweep['points']) + " training games")
+    mean_scores = sweep['mean_scores']
+    win_rates = sweep['win_rates']
+    execution_times = sweep['execution_times']
+
+    # Write the header to the CSV file once, with the completed points
     with open('game_scores.csv', mode='w', newline='') as file:
         writer = csv.writer(file)
         writer.writerow(['Num Training Games', 'Scores', 'Mean Score', 'Standard Deviation'])
+        writer.writerows(sweep['rows'])
 
     for nt in num_training:
+        if nt in sweep['points']:
+            continue
         start_time = time.time()
-        games = runGames( lay, agent, gagts, display, numGames=(nt+10), record=False,
-            numTraining=nt, catchExceptions=False, timeout=5)
+        scores = []
+        num_wins = 0
+        num_truncated = 0
+        for result in iterGames(lay, agent, gagts, display,
+                                numGames=(nt+10), numTraining=nt,
+                                catchExceptions=False, timeout=5,
+                                maxMoves=args.maxmoves,
+                                stallWindow=args.stallwindow):
+            scores.append(result.score)
+            num_wins += result.win
+            num_truncated += result.truncated is not None
         end_time = time.time()
         execution_time = end_time - start_time
         execution_times.append(execution_time)
 
-        scores = [g.state.getScore() for g in games]
         mean_score = statistics.mean(scores)
         std_dev_score = statistics.stdev(scores)
         mean_scores.append(mean_score)
 
-        wins = [game.state.isWin() for game in games]
-        win_rate = wins.count(True) / float(len(wins))
+        win_rate = num_wins / float(len(scores))
         win_rates.append(win_rate*100)
 
         # Write to CSV file
+        row = [nt, scores, mean_score, std_dev_score, win_rate, execution_time]
         with open('game_scores.csv', mode='a', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow([nt, scores, mean_score, std_dev_score, win_rate, execution_time])
+            writer.writerow(row)
+
+        sweep['points'].append(nt)
+        sweep['rows'].append(row)
+        save_checkpoint(args.checkpoint, agent, sweep)
 
         print("Mean Total Score : " + str(mean_score) + " at " + str(num_training) + " training games")
         print("Standard Deviation of Scores : " + str(std_dev_score))
         print("Win Rate : " + str(win_rate * 100) + "%")
+        print("Truncated Games : " + str(num_truncated))
         print("Execution Time : " + str(execution_time) + " seconds")
 
     # Plot mean scores, win rates, and execution times versus number of training games
@@ -0,0 +1,24 @@
+from pacman_module.game import Agent, Directions
+
+
+class RandomPacman(Agent):
+    """
+    Plays a random legal move other than STOP, drawn from the game's random
+    number generator.
+    """
+
+    def get_action(self, state):
+        legal = [action for action in state.getLegalActions(0)
+                 if action != Directions.STOP]
+        return self.rng.choice(legal) if legal else Directions.STOP
+
+
+class FirstPacman(Agent):
+    """
+    Plays the first legal move other than STOP, without random numbers.
+    """
+
+    def get_action(self, state):
+        legal = [action for action in state.getLegalActions(0)
+                 if action != Directions.STOP]
+        return legal[0] if legal else Directions.STOP
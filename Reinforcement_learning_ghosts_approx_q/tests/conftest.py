@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pacman_module import layout  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """
+    Keeps the layout caches of every test in a fresh directory.
+    """
+    path = str(tmp_path / 'cache')
+    monkeypatch.setattr(layout, 'CACHE_DIR', path)
+    return path
@@ -0,0 +1,86 @@
+import collections
+import os
+
+import pytest
+
+from pacman_module import mazes
+from pacman_module.distances import DistanceOracle
+from pacman_module.layout import Layout, getLayout
+
+
+def bfsDistances(lay, source):
+    """
+    Returns the maze distances from `source` to the cells it reaches.
+    """
+    distances = {source: 0}
+    fringe = collections.deque([source])
+    while fringe:
+        x, y = fringe.popleft()
+        for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+            cell = (x + dx, y + dy)
+            if (0 <= cell[0] < lay.width and 0 <= cell[1] < lay.height and
+                    not lay.walls[cell[0]][cell[1]] and
+                    cell not in distances):
+                distances[cell] = distances[(x, y)] + 1
+                fringe.append(cell)
+    return distances
+
+
+LAYOUTS = [
+    lambda: getLayout('medium_adv'),
+    lambda: getLayout('large_adv'),
+    lambda: mazes.generateLayout(25, 17, seed=3, loops=0.2),
+    # Two rooms that cannot reach each other
+    lambda: Layout(['%%%%%%%', '%P.%.G%', '%..%..%', '%%%%%%%']),
+]
+
+
+@pytest.mark.parametrize('makeLayout', LAYOUTS)
+def test_distances_match_breadth_first_search(makeLayout):
+    lay = makeLayout()
+    oracle = DistanceOracle(lay)
+    for source in oracle.cells:
+        expected = bfsDistances(lay, source)
+        for target in oracle.cells:
+            assert oracle.distance(source, target) == \
+                expected.get(target, float('inf'))
+
+
+@pytest.mark.parametrize('makeLayout', LAYOUTS)
+def test_next_hops_follow_shortest_paths(makeLayout):
+    lay = makeLayout()
+    oracle = DistanceOracle(lay)
+    for source in oracle.cells[::3]:
+        for target in oracle.cells:
+            hop = oracle.next_hop(source, target)
+            distance = oracle.distance(source, target)
+            if distance == float('inf'):
+                assert hop is None
+            elif distance == 0:
+                assert hop == source
+            else:
+                assert oracle.distance(hop, target) == distance - 1
+                assert oracle.distance(source, hop) == 1
+
+
+def test_positions_between_cells_are_taken_at_the_nearest_cell():
+    oracle = DistanceOracle(getLayout('medium_adv'))
+    for x, y in oracle.cells:
+        if (x + 1, y) in oracle.cellIds:
+            for target in oracle.cells:
+                assert oracle.distance((x + 0.5, y), target) == \
+                    oracle.distance((x + 1, y), target)
+
+
+def test_distances_are_cached(cache_dir):
+    # A layout of its own, without distances loaded
+    lay = Layout(getLayout('medium_adv').layoutText)
+    assert not DistanceOracle.isCached(lay)
+    assert lay.getDistances(build=False) is None
+    oracle = DistanceOracle(lay)
+    assert DistanceOracle.isCached(lay)
+    assert os.path.exists(os.path.join(cache_dir,
+                                       DistanceOracle.cacheName(lay)))
+    # A second oracle maps the cached matrix instead of searching
+    cached = DistanceOracle(lay)
+    assert (cached.matrix == oracle.matrix).all()
@@ -0,0 +1,97 @@
+import pytest
+
+from pacman_module import mazes
+from pacman_module.game import Actions, Directions
+from pacman_module.junctions import JunctionGraph
+from pacman_module.layout import Layout, getLayout
+
+
+def freeCells(lay):
+    return [(x, y) for x in range(lay.width) for y in range(lay.height)
+            if not lay.walls[x][y]]
+
+
+def neighbors(lay, cell):
+    x, y = cell
+    return [(x + dx, y + dy) for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0))
+            if 0 <= x + dx < lay.width and 0 <= y + dy < lay.height and
+            not lay.walls[x + dx][y + dy]]
+
+
+LAYOUTS = [
+    lambda: getLayout('medium_adv'),
+    lambda: getLayout('large_adv'),
+    lambda: mazes.generateLayout(25, 17, seed=5, loops=0.2),
+    # A corridor closed on itself, without junction
+    lambda: Layout(['%%%%%', '%P..%', '%.%.%', '%...%', '%%%%%']),
+]
+
+
+@pytest.mark.parametrize('makeLayout', LAYOUTS)
+def test_edges_follow_corridors(makeLayout):
+    lay = makeLayout()
+    graph = JunctionGraph(lay)
+    for node in graph.nodes:
+        assert len(graph.edges[node]) == len(neighbors(lay, node))
+        for edge in graph.edges[node]:
+            assert edge.start == node
+            assert len(edge) == len(edge.cells) > 0
+            pos = node
+            for action, cell in zip(edge.actions, edge.cells):
+                dx, dy = Actions.directionToVector(action)
+                pos = (int(pos[0] + dx), int(pos[1] + dy))
+                assert pos == cell
+                assert not lay.walls[cell[0]][cell[1]]
+            assert edge.end == edge.cells[-1]
+            assert graph.isNode(edge.end)
+            # Cells between the ends are corridor cells
+            for cell in edge.cells[:-1]:
+                assert not graph.isNode(cell)
+                assert len(neighbors(lay, cell)) == 2
+
+
+@pytest.mark.parametrize('makeLayout', LAYOUTS)
+def test_edges_count_their_food(makeLayout):
+    lay = makeLayout()
+    graph = JunctionGraph(lay)
+    for edges in graph.edges.values():
+        for edge in edges:
+            inner = edge.cells[:-1]
+            assert edge.food == sum(lay.food[x][y] for x, y in inner)
+            assert graph.getFood(edge, lay.food) == edge.food
+            eaten = lay.food.copy()
+            for x, y in inner:
+                eaten[x][y] = False
+            assert graph.getFood(edge, eaten) == 0
+
+
+@pytest.mark.parametrize('makeLayout', LAYOUTS)
+def test_edges_cover_the_layout_both_ways(makeLayout):
+    lay = makeLayout()
+    graph = JunctionGraph(lay)
+    covered = set(graph.nodes)
+    lengths = {}
+    for edges in graph.edges.values():
+        for edge in edges:
+            covered.update(edge.cells)
+            key = (edge.start, edge.end, tuple(edge.cells[:-1]))
+            lengths[key] = len(edge)
+    assert covered == set(freeCells(lay))
+    # Every edge is followed back with the same length
+    for (start, end, inner), length in lengths.items():
+        assert lengths[(end, start, inner[::-1])] == length
+    assert graph.getNumEdges() == len(lengths)
+
+
+def test_corridor_cells_reach_both_ends():
+    lay = getLayout('large_adv')
+    graph = JunctionGraph(lay)
+    for cell in freeCells(lay):
+        if graph.isNode(cell):
+            continue
+        edges = graph.getMacroActions(cell)
+        assert len(edges) == 2
+        assert all(graph.isNode(edge.end) for edge in edges)
+        assert set(edge.actions[0] for edge in edges) == set(
+            action for action in lay.getMoveTable().actions[cell]
+            if action != Directions.STOP)
@@ -0,0 +1,69 @@
+import collections
+
+import pytest
+
+from pacman_module import mazes
+from pacman_module.layout import getLayout
+
+
+def reachable(lay, start):
+    seen = {start}
+    fringe = collections.deque([start])
+    while fringe:
+        x, y = fringe.popleft()
+        for cell in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+            if not lay.walls[cell[0]][cell[1]] and cell not in seen:
+                seen.add(cell)
+                fringe.append(cell)
+    return seen
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_mazes_are_determined_by_their_seed(seed):
+    first = mazes.generateLayout(31, 21, seed=seed, loops=0.2)
+    second = mazes.generateLayout(31, 21, seed=seed, loops=0.2)
+    assert first.layoutText == second.layoutText
+    assert first.getFingerprint() == second.getFingerprint()
+
+
+def test_seeds_give_different_mazes():
+    texts = set(tuple(mazes.generateLayout(31, 21, seed=seed).layoutText)
+                for seed in range(10))
+    assert len(texts) == 10
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_mazes_are_closed_and_connected(seed):
+    lay = mazes.generateLayout(31, 21, seed=seed, loops=0.2, capsules=3,
+                               ghosts=2)
+    assert (lay.width, lay.height) == (31, 21)
+    for x in range(lay.width):
+        assert lay.walls[x][0] and lay.walls[x][lay.height - 1]
+    for y in range(lay.height):
+        assert lay.walls[0][y] and lay.walls[lay.width - 1][y]
+    assert lay.getNumGhosts() == 2
+    assert len(lay.capsules) == 3
+    assert lay.totalFood > 0
+    pacman = [pos for isPacman, pos in lay.agentPositions if isPacman][0]
+    free = set((x, y) for x in range(lay.width) for y in range(lay.height)
+               if not lay.walls[x][y])
+    assert reachable(lay, pacman) == free
+
+
+def test_perfect_mazes_have_no_loops():
+    lay = mazes.generateLayout(31, 21, seed=1, loops=0)
+    free = [(x, y) for x in range(lay.width) for y in range(lay.height)
+            if not lay.walls[x][y]]
+    edges = sum(1 for x, y in free for cell in ((x + 1, y), (x, y + 1))
+                if not lay.walls[cell[0]][cell[1]])
+    # A spanning tree of the free cells
+    assert edges == len(free) - 1
+
+
+def test_transforms_keep_the_layout():
+    lay = getLayout('medium_adv')
+    padded = mazes.padBorders(lay, 2)
+    assert (padded.width, padded.height) == (lay.width + 2, lay.height + 2)
+    assert padded.totalFood == lay.totalFood
+    mirrored = mazes.mirrorLayout(mazes.mirrorLayout(lay))
+    assert mirrored.layoutText == lay.layoutText
@@ -0,0 +1,36 @@
+import pytest
+
+from pacman_module import textDisplay
+from pacman_module.ghostAgents import GreedyGhost
+from pacman_module.layout import getLayout
+from pacman_module.pacman import runGames
+
+from agents import RandomPacman
+
+
+def play(workers, numTraining=0, pacman=None):
+    lay = getLayout('medium_adv')
+    # Ghosts attacking with probability 0.8 draw from the game's generator
+    ghosts = [GreedyGhost(i + 1, 0.8, 0.8) for i in range(lay.getNumGhosts())]
+    games = runGames(lay, pacman or RandomPacman(), ghosts,
+                     textDisplay.NullGraphics(), 12, False,
+                     numTraining=numTraining, timeout=0, seed=7,
+                     workers=workers, turbo=True)
+    return [(game.state.getScore(), game.state.isWin(), game.moveHistory,
+             game.truncated) for game in games]
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_pooled_games_match_serial_games(workers):
+    assert play(workers) == play(None)
+
+
+def test_pooled_games_match_serial_games_after_training():
+    assert play(2, numTraining=4) == play(None, numTraining=4)
+
+
+def test_pool_refuses_learning_agents():
+    agent = RandomPacman()
+    agent.learns = True
+    with pytest.raises(Exception, match='learns'):
+        play(2, pacman=agent)
@@ -0,0 +1,75 @@
+import pytest
+
+from pacman_module import textDisplay
+from pacman_module.ghostAgents import GreedyGhost
+from pacman_module.layout import getLayout
+from pacman_module.pacman import runGames
+from pacman_module.recording import GameArchive, GameRecorder
+
+from agents import RandomPacman
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    lay = getLayout('medium_adv')
+    ghosts = [GreedyGhost(i + 1, 0.8, 0.8) for i in range(lay.getNumGhosts())]
+    path = str(tmp_path / 'games.pcr')
+    games = runGames(lay, RandomPacman(), ghosts, textDisplay.NullGraphics(),
+                     5, path, timeout=0, seed=11, turbo=True)
+    archive = GameArchive(path)
+    yield lay, games, archive
+    archive.close()
+
+
+def test_replays_match_the_recorded_games(recorded):
+    lay, games, archive = recorded
+    assert len(archive) == len(games)
+    for i, game in enumerate(games):
+        replay = archive.getReplay(i, lay, checkpointInterval=8)
+        assert len(replay) == len(game.moveHistory)
+        assert replay.getMoves() == game.moveHistory
+        assert replay.seed is not None
+        final = replay.getState(len(replay))
+        assert final == game.state
+        assert final.getScore() == game.state.getScore()
+        assert final.isWin() == game.state.isWin()
+        assert final.isLose() == game.state.isLose()
+
+
+def test_replay_states_follow_the_moves(recorded):
+    lay, games, archive = recorded
+    replay = archive.getReplay(0, lay, checkpointInterval=4)
+    # States are rebuilt from checkpoints in any order
+    plies = list(range(len(replay) + 1))
+    expected = [replay.getState(0)]
+    for ply in plies[1:]:
+        expected.append(expected[-1].generateSuccessor(
+            *replay.getMove(ply - 1)))
+    for ply in reversed(plies):
+        assert replay.getState(ply) == expected[ply]
+    with pytest.raises(IndexError):
+        replay.getState(len(replay) + 1)
+
+
+def test_replays_check_the_layout(recorded):
+    lay, games, archive = recorded
+    with pytest.raises(Exception, match='not played on this layout'):
+        archive.getReplay(0, getLayout('small_adv'))
+
+
+def test_unfinished_games_are_indexed(tmp_path):
+    lay = getLayout('medium_adv')
+    path = str(tmp_path / 'unfinished.pcr')
+    recorder = GameRecorder(path)
+    recorder.recordGame(lay, 2, [(0, 'West'), (1, 'East')], seed=5)
+    recorder.startGame(lay, 2)
+    recorder.recordMove('East')
+    recorder.close()
+    archive = GameArchive(path)
+    assert len(archive) == 2
+    assert archive.getReplay(0, lay).getMoves() == [(0, 'West'), (1, 'East')]
+    assert archive.getReplay(0, lay).seed == 5
+    replay = archive.getReplay(1, lay)
+    assert replay.seed is None
+    assert replay.getMoves() == [(0, 'East')]
+    archive.close()
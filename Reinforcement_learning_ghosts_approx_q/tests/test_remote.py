@@ -0,0 +1,144 @@
+import functools
+import multiprocessing
+
+import pytest
+
+from pacman_module import textDisplay
+from pacman_module.ghostAgents import DumbyGhost, GreedyGhost
+from pacman_module.layout import getLayout
+from pacman_module.pacman import ClassicGameRules, GameState, runGames
+from pacman_module.pacman import seedGame
+from pacman_module.remote import AgentServer, RemoteAgent
+
+from agents import FirstPacman, RandomPacman
+
+
+class ObservingGhost(DumbyGhost):
+    """
+    A DumbyGhost remembering the hash of every state it observes.
+    """
+
+    def __init__(self, index):
+        super().__init__(index)
+        self.observed = []
+
+    def get_action(self, state):
+        self.observed.append(hash(state))
+        return super().get_action(state)
+
+
+class FlakyGhost(DumbyGhost):
+    """
+    A DumbyGhost raising on every other move.
+    """
+    moves = 0
+
+    def get_action(self, state):
+        self.moves += 1
+        if self.moves % 2 == 0:
+            raise ValueError("flaky ghost")
+        return super().get_action(state)
+
+
+class RandomGhost(GreedyGhost):
+    def __init__(self, index):
+        super().__init__(index, 0.5, 0.5)
+
+
+class DesyncedRemoteAgent(RemoteAgent):
+    """
+    Sends a wrong score change in the delta of the first move of a game.
+    """
+
+    def observe_move(self, agentIndex, action, state):
+        super().observe_move(agentIndex, action, state)
+        if len(self.deltas) == 1 and not getattr(self, 'desynced', False):
+            agentIndex, code, scoreChange, food, capsule = self.deltas[0]
+            self.deltas[0] = (agentIndex, code, scoreChange + 1, food,
+                              capsule)
+            self.desynced = True
+
+
+def playGame(pacman, ghost, lay=None, seed=None):
+    """
+    Plays one game without closing the agents, and returns it.
+    """
+    lay = lay or getLayout('medium_adv')
+    rules = ClassicGameRules(0, maxMoves=300)
+    rules.quiet = True
+    game = rules.newGame(lay, pacman, [ghost], textDisplay.NullGraphics(),
+                         True, rng=None if seed is None else seedGame(seed))
+    game.runTurbo()
+    return game
+
+
+def test_remote_agents_play_like_local_agents():
+    local = ObservingGhost(1)
+    remote = RemoteAgent(1, functools.partial(ObservingGhost, 1), 'local')
+    localGame = playGame(FirstPacman(), local)
+    remoteGame = playGame(FirstPacman(), remote)
+    assert remoteGame.moveHistory == localGame.moveHistory
+    assert remoteGame.state.getScore() == localGame.state.getScore()
+    # The mirrored states the worker played on are the game's
+    assert remote.connection.server.agent.observed == local.observed
+    assert not remote.crashed
+    remote.close()
+
+
+def test_agent_errors_cost_the_move_only():
+    remote = RemoteAgent(1, functools.partial(FlakyGhost, 1), 'local')
+    game = playGame(FirstPacman(), remote)
+    assert not remote.crashed
+    ghostMoves = [action for index, action in game.moveHistory if index == 1]
+    assert len(ghostMoves) > 10
+    # The worker was asked for every move, failed ones included
+    assert remote.connection.server.agent.moves == len(ghostMoves)
+    remote.close()
+
+
+def test_desync_gives_the_worker_up():
+    remote = DesyncedRemoteAgent(1, functools.partial(DumbyGhost, 1),
+                                 'local')
+    game = playGame(FirstPacman(), remote)
+    assert remote.crashed
+    assert game.gameOver
+    remote.close()
+
+
+def test_server_reports_desync():
+    lay = getLayout('medium_adv')
+    state = GameState()
+    state.initialize(lay, 1)
+    server = AgentServer(DumbyGhost(1))
+    assert server.handle(('start', lay.getFingerprint(), lay.layoutText, 1,
+                          hash(state), None)) is None
+    action = state.getLegalActions(0)[0]
+    successor = state.generateSuccessor(0, action)
+    data = successor.data
+    delta = (0, ['North', 'South', 'East', 'West', 'Stop'].index(action),
+             data.scoreChange + 1, data._foodEaten, data._capsuleEaten)
+    requestId, action, error, synced = server.handle(
+        ('act', 1, [delta], hash(successor), 1, None))
+    assert action is None and error is not None and not synced
+
+
+@pytest.mark.parametrize('transport', ['local', 'pipe'])
+def test_seeded_remote_games_are_reproducible(transport):
+    def play(seed):
+        ghost = RemoteAgent(1, functools.partial(RandomGhost, 1), transport)
+        games = runGames(getLayout('medium_adv'), RandomPacman(), [ghost],
+                         textDisplay.NullGraphics(), 4, False, timeout=0,
+                         seed=seed, turbo=True)
+        return [game.moveHistory for game in games]
+
+    assert play(5) == play(5)
+    assert play(5) != play(6)
+
+
+def test_run_games_closes_workers():
+    ghost = RemoteAgent(1, functools.partial(DumbyGhost, 1), 'pipe')
+    runGames(getLayout('medium_adv'), RandomPacman(), [ghost],
+             textDisplay.NullGraphics(), 2, False, timeout=0, seed=1,
+             turbo=True)
+    assert ghost.connection is None
+    assert multiprocessing.active_children() == []
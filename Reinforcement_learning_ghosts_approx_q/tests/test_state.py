@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from pacman_module import mazes
+from pacman_module.layout import getLayout
+from pacman_module.pacman import GameState
+
+
+def snapshotData(state):
+    data = state.data
+    return (hash(state), data.computeHash(), data.score, data.food.bits,
+            list(data.capsules), list(data._eaten or []), data._win,
+            data._lose, [(agentState.configuration, agentState.scaredTimer)
+                         for agentState in data.agentStates])
+
+
+def initialState(lay):
+    state = GameState()
+    state.initialize(lay, lay.getNumGhosts())
+    return state
+
+
+def randomWalk(state, rng, length):
+    """
+    Yields (agentIndex, action, state) along a random game from `state`,
+    avoiding the moves that end it so that games last.
+    """
+    agentIndex = 0
+    for _ in range(length):
+        if state.isWin() or state.isLose():
+            return
+        legal = state.getLegalActions(agentIndex)
+        safe = []
+        for action in legal:
+            successor = state.generateSuccessor(agentIndex, action)
+            if not successor.isWin() and not successor.isLose():
+                safe.append(action)
+        action = rng.choice(safe or legal)
+        yield agentIndex, action, state
+        state = state.generateSuccessor(agentIndex, action)
+        agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+
+def capsuleMaze():
+    # Random walks on this maze eat capsules: ghosts get scared and move
+    # between grid points
+    return mazes.generateLayout(21, 15, seed=4, loops=0.3, capsules=6,
+                                ghosts=2)
+
+
+LAYOUTS = [
+    lambda: getLayout('medium_adv'),
+    lambda: getLayout('small_adv'),
+    capsuleMaze,
+]
+
+
+def test_random_walks_scare_the_ghosts():
+    states = [state for _, _, state in
+              randomWalk(initialState(capsuleMaze()), random.Random(0), 400)]
+    assert any(ghost.scaredTimer > 0 and not ghost.configuration.isInteger()
+               for state in states for ghost in state.data.agentStates[1:])
+
+
+@pytest.mark.parametrize('makeLayout', LAYOUTS)
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_hash_matches_computed_hash(makeLayout, seed):
+    rng = random.Random(seed)
+    state = initialState(makeLayout())
+    assert state.data._hash == state.data.computeHash()
+    for agentIndex, action, state in randomWalk(state, rng, 400):
+        successor = state.generateSuccessor(agentIndex, action)
+        assert successor.data._hash == successor.data.computeHash()
+
+
+@pytest.mark.parametrize('makeLayout', LAYOUTS)
+@pytest.mark.parametrize('seed', range(5))
+def test_apply_matches_generate_successor(makeLayout, seed):
+    rng = random.Random(seed)
+    for agentIndex, action, state in randomWalk(
+            initialState(makeLayout()), rng, 400):
+        before = snapshotData(state)
+        successor = state.generateSuccessor(agentIndex, action)
+        token = state.apply(agentIndex, action)
+        assert state == successor
+        assert snapshotData(state) == snapshotData(successor)
+        state.undo(token)
+        assert snapshotData(state) == before
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_nested_undo_restores_the_state(seed):
+    rng = random.Random(seed)
+    state = initialState(capsuleMaze())
+    before = snapshotData(state)
+    tokens = []
+    agentIndex = 0
+    for _ in range(200):
+        legal = state.getLegalActions(agentIndex)
+        if not legal:
+            break
+        tokens.append(state.apply(agentIndex, rng.choice(legal)))
+        assert state.data._hash == state.data.computeHash()
+        agentIndex = (agentIndex + 1) % state.getNumAgents()
+    for token in reversed(tokens):
+        state.undo(token)
+    assert snapshotData(state) == before
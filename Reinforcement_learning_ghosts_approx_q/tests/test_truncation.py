@@ -0,0 +1,53 @@
+from pacman_module import textDisplay
+from pacman_module.game import Agent, Directions, Game
+from pacman_module.ghostAgents import DumbyGhost, GreedyGhost
+from pacman_module.layout import getLayout
+from pacman_module.pacman import iterGames, runGames
+
+from agents import FirstPacman, RandomPacman
+
+
+class StopPacman(Agent):
+    def get_action(self, state):
+        return Directions.STOP
+
+
+def play(pacman, layoutName, ghosts=(), **kwargs):
+    return runGames(getLayout(layoutName), pacman, list(ghosts),
+                    textDisplay.NullGraphics(), 3, False, timeout=0, seed=1,
+                    turbo=True, **kwargs)
+
+
+def test_games_are_truncated_after_max_moves():
+    for game in play(FirstPacman(), 'medium_adv', [DumbyGhost(1)],
+                     maxMoves=40):
+        assert game.truncated == Game.TRUNCATED_MOVES
+        assert len(game.moveHistory) == 40
+        assert not game.state.isWin() and not game.state.isLose()
+
+
+def test_stalled_games_are_truncated():
+    # Pacman standing still on a layout without ghosts never ends the game
+    for game in play(StopPacman(), 'small', stallWindow=10):
+        assert game.truncated == Game.TRUNCATED_STALL
+        assert not game.state.isWin() and not game.state.isLose()
+        # The same position comes up three times after two moves
+        assert len(game.moveHistory) == 3
+
+
+def test_finished_games_are_not_truncated():
+    games = play(RandomPacman(), 'medium_adv', [GreedyGhost(1)],
+                 maxMoves=10000, stallWindow=100)
+    for game in games:
+        assert game.truncated is None
+        assert game.state.isWin() or game.state.isLose()
+
+
+def test_results_report_truncation():
+    results = list(iterGames(getLayout('small'), StopPacman(), [],
+                             textDisplay.NullGraphics(), 2, timeout=0,
+                             seed=1, turbo=True, maxMoves=25))
+    assert [result.truncated for result in results] == \
+        [Game.TRUNCATED_MOVES] * 2
+    assert [result.moves for result in results] == [25, 25]
+    assert not any(result.win or result.lose for result in results)
@@ -0,0 +1,59 @@
+import pytest
+
+from pacman_module import textDisplay
+from pacman_module.game import Agent, Directions
+from pacman_module.ghostAgents import GreedyGhost
+from pacman_module.layout import getLayout
+from pacman_module.pacman import runGames
+
+from agents import RandomPacman
+
+
+def play(pacman, turbo, timeout=0, catchExceptions=False, numGames=8):
+    lay = getLayout('medium_adv')
+    ghosts = [GreedyGhost(i + 1, 0.8, 0.8) for i in range(lay.getNumGhosts())]
+    return runGames(lay, pacman, ghosts, textDisplay.NullGraphics(),
+                    numGames, False, catchExceptions=catchExceptions,
+                    timeout=timeout, seed=3, turbo=turbo)
+
+
+def summary(games):
+    return [(game.state.getScore(), game.state.isWin(), game.moveHistory,
+             game.numMoves) for game in games]
+
+
+def test_turbo_plays_the_same_games():
+    assert summary(play(RandomPacman(), True)) == \
+        summary(play(RandomPacman(), False))
+
+
+def test_moves_are_counted_per_round():
+    for game in play(RandomPacman(), True) + play(RandomPacman(), False):
+        assert game.numMoves == len(game.moveHistory) // len(game.agents)
+
+
+class StopPacman(Agent):
+    def get_action(self, state):
+        return Directions.STOP
+
+
+class AbandonedSearch(StopPacman):
+    """
+    Applies a move to the observed state and stops without undoing it, as
+    a search cut off midway does.
+    """
+
+    def get_action(self, state):
+        legal = [action for action in state.getLegalActions(0)
+                 if action != Directions.STOP]
+        state.apply(0, legal[0])
+        return Directions.STOP
+
+
+@pytest.mark.parametrize('timeout, catchExceptions', [(30, False),
+                                                      (0, True)])
+def test_abandoned_searches_leave_the_game_alone(timeout, catchExceptions):
+    assert summary(play(AbandonedSearch(), True, timeout, catchExceptions,
+                        numGames=3)) == \
+        summary(play(StopPacman(), True, timeout, catchExceptions,
+                     numGames=3))
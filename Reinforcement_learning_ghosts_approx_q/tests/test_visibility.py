@@ -0,0 +1,81 @@
+import pytest
+
+from pacman_module import mazes
+from pacman_module.game import Actions, Directions
+from pacman_module.layout import Layout, getLayout
+from pacman_module.visibility import VisibilityIndex
+
+DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST,
+              Directions.WEST, Directions.STOP]
+
+
+def rayCast(lay, pos, direction):
+    """
+    Returns the cells seen from `pos` facing `direction`, stepping ahead
+    until a wall or the edge of the grid.
+    """
+    seen = set()
+    if direction == Directions.STOP or lay.walls[pos[0]][pos[1]]:
+        return seen
+    dx, dy = (int(d) for d in Actions.directionToVector(direction))
+    x, y = pos[0] + dx, pos[1] + dy
+    while 0 <= x < lay.width and 0 <= y < lay.height and not lay.walls[x][y]:
+        seen.add((x, y))
+        x, y = x + dx, y + dy
+    return seen
+
+
+LAYOUTS = [
+    lambda: getLayout('medium_adv'),
+    lambda: getLayout('large_adv'),
+    lambda: mazes.generateLayout(25, 17, seed=2, loops=0.3),
+    # Open cells on the border of the grid
+    lambda: Layout(['%%%%%% ', '%P.G%  ', '%%%%%%%']),
+]
+
+
+@pytest.mark.parametrize('makeLayout', LAYOUTS)
+def test_visible_cells_match_a_ray_cast(makeLayout):
+    lay = makeLayout()
+    index = VisibilityIndex(lay)
+    cells = [(x, y) for x in range(lay.width) for y in range(lay.height)]
+    for pos in cells:
+        for direction in DIRECTIONS:
+            seen = rayCast(lay, pos, direction)
+            assert set(cell for cell in cells
+                       if index.isVisible(pos, direction, cell)) == seen
+            mask = index.getVisibleMask(pos, direction)
+            assert set(cell for cell in cells
+                       if mask >> (cell[0] * lay.height + cell[1]) & 1) == seen
+
+
+@pytest.mark.parametrize('makeLayout', LAYOUTS[:3])
+def test_targets_between_cells_are_seen_when_either_cell_is(makeLayout):
+    lay = makeLayout()
+    index = VisibilityIndex(lay)
+    for x in range(lay.width - 1):
+        for y in range(lay.height - 1):
+            if lay.walls[x][y]:
+                continue
+            for direction in DIRECTIONS:
+                seen = rayCast(lay, (x, y), direction)
+                for tx in range(lay.width - 1):
+                    target = (tx + 0.5, y)
+                    expected = direction in (Directions.EAST,
+                                             Directions.WEST) and bool(
+                        {(tx, y), (tx + 1, y)} & seen)
+                    assert index.isVisible((x, y), direction, target) == \
+                        expected
+                for ty in range(lay.height - 1):
+                    target = (x, ty + 0.5)
+                    expected = direction in (Directions.NORTH,
+                                             Directions.SOUTH) and bool(
+                        {(x, ty), (x, ty + 1)} & seen)
+                    assert index.isVisible((x, y), direction, target) == \
+                        expected
+
+
+def test_index_size_grows_with_cells():
+    lay = mazes.generateLayout(101, 101, seed=1)
+    index = VisibilityIndex(lay)
+    assert index.runs.nbytes == 4 * 4 * lay.width * lay.height